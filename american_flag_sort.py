@@ -0,0 +1,128 @@
+import numpy as np
+
+from bucket_sort_numpy import _ranges
+from instrumentation import instrumented, phase
+from key_transform import encode_keys
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+DIGIT_BITS = 8
+
+# Keys moved per step. Every temporary is a few arrays of this length, so
+# extra memory stays O(BLOCK + 2^DIGIT_BITS) whatever the input size.
+BLOCK = 1 << 16
+
+# Buckets this small are finished with ndarray.sort, which also sorts in place
+LEAF_SIZE = 1 << 16
+
+INTEGER_DTYPES = tuple(
+    np.dtype(t)
+    for t in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64)
+)
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _blocks(start, stop):
+    for a in range(start, stop, BLOCK):
+        yield a, min(stop, a + BLOCK)
+
+
+def _digits(block, lo, shift):
+    # Digit of each key's offset from lo; offsets go through uint64 so a
+    # full 64-bit span does not overflow.
+    offsets = (encode_keys(block)[0] - np.int64(lo)).view(np.uint64)
+    return (offsets >> np.uint64(shift)).astype(np.intp)
+
+
+def _bounds(array):
+    lo = min(int(encode_keys(array[a:b])[0].min()) for a, b in _blocks(0, len(array)))
+    hi = max(int(encode_keys(array[a:b])[0].max()) for a, b in _blocks(0, len(array)))
+    return lo, hi
+
+
+def _histogram(array, start, stop, lo, shift, radix):
+    counts = np.zeros(radix, dtype=np.int64)
+    for a, b in _blocks(start, stop):
+        counts += np.bincount(_digits(array[a:b], lo, shift), minlength=radix)
+    return counts
+
+
+def _permute(array, start, counts, lo, shift):
+    # American-flag permutation, a block of keys at a time: take the next
+    # unplaced block of bucket b, put its own keys at b's head, send the
+    # others to their buckets' heads, and move the keys they displace into
+    # the rest of the block, where they wait (still unplaced) in b's region.
+    # Every step places the whole block, so there are about n / BLOCK steps.
+    ends = start + np.cumsum(counts)
+    heads = ends - counts
+    for b in np.flatnonzero(counts):
+        while heads[b] < ends[b]:
+            a = int(heads[b])
+            stop = min(int(ends[b]), a + BLOCK)
+            chunk = array[a:stop].copy()
+            digits = _digits(chunk, lo, shift)
+            grouped = chunk[np.argsort(digits, kind="stable")]
+            chunk_counts = np.bincount(digits, minlength=len(counts))
+            own = int(chunk_counts[b])
+            first = int(chunk_counts[:b].sum())
+
+            others = np.flatnonzero(chunk_counts)
+            others = others[others != b]
+            if len(others):
+                slots = _ranges(heads[others], chunk_counts[others])
+                array[a + own:stop] = array[slots]
+                array[slots] = np.concatenate((grouped[:first], grouped[first + own:]))
+            array[a:a + own] = grouped[first:first + own]
+
+            heads[others] += chunk_counts[others]
+            heads[b] += own
+
+
+def _flag_sort(array, start, stop, lo, bits):
+    # Sort array[start:stop], whose keys lie in [lo, lo + 2^bits)
+    if stop - start <= LEAF_SIZE:
+        array[start:stop].sort()
+        return
+
+    shift = max(0, bits - DIGIT_BITS)
+    counts = _histogram(array, start, stop, lo, shift, 1 << (bits - shift))
+    _permute(array, start, counts, lo, shift)
+    if shift == 0:
+        return  # every bucket holds a single value
+
+    bucket_starts = start + np.cumsum(counts) - counts
+    for b in np.flatnonzero(counts > 1):
+        s = int(bucket_starts[b])
+        _flag_sort(array, s, s + int(counts[b]), lo + (int(b) << shift), shift)
+
+
+# ---------------------------------------
+# AMERICAN FLAG SORT
+# ---------------------------------------
+@instrumented("american_flag")
+def american_flag_sort(array):
+    """Sort a contiguous integer array in place and return it.
+
+    MSD radix sort: a histogram of the leading digit gives each bucket's
+    offsets, keys are permuted into their buckets inside the array's own
+    buffer, and buckets are recursed on with the next digit. Extra memory is
+    O(BLOCK + 2^DIGIT_BITS) instead of O(n).
+    """
+    if not isinstance(array, np.ndarray) or array.dtype not in INTEGER_DTYPES:
+        raise TypeError(f"american_flag_sort needs an integer ndarray, got {getattr(array, 'dtype', type(array))}")
+    if not array.flags.c_contiguous or not array.flags.writeable:
+        raise ValueError("american_flag_sort sorts in place and needs a writeable contiguous array")
+
+    flat = array.reshape(-1)
+    if len(flat) <= LEAF_SIZE:
+        flat.sort()
+        return array
+
+    with phase("find_range"):
+        lo, hi = _bounds(flat)
+    with phase("flag_sort", elements=len(flat)):
+        _flag_sort(flat, 0, len(flat), lo, (hi - lo).bit_length())
+    return array
@@ -0,0 +1,406 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+from american_flag_sort import american_flag_sort
+from bucket_sort_improved import (
+    better_magnitude_sorting_benchmarks,
+    better_sorting_benchmarks,
+    better_sorting_by_units_benchmarks,
+)
+from bucket_sort_numpy import (
+    bucket_sort_numpy,
+    counting_sort_numpy,
+    magnitude_sort_numpy,
+    sample_bucket_sort,
+    units_sort_numpy,
+)
+from dataset_generator import DEFAULT_CACHE_DIR, DISTRIBUTIONS, load_dataset
+from radix_sort import radix_sort
+from sort_dispatch import sort
+from sparse_counting import sparse_counting_sort
+from threaded_sort import threaded_sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+REPEATS = 5
+WARMUP = 1
+SEED = 42
+
+# A case counts as a regression when its median is this much slower than
+# the baseline's, and by more than the two runs' IQRs together (noise)
+REGRESSION_THRESHOLD = 0.10
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+DEFAULT_RANGES = [10**6, 10**10]
+DEFAULT_DISTRIBUTIONS = ["uniform", "zipf", "few_distinct"]
+
+
+# ---------------------------------------
+# PURE-PYTHON REFERENCES
+# ---------------------------------------
+def counting_sort_original(arr):
+    max_value = max(arr)
+    temp_array = [0] * (max_value + 1)
+    for v in arr:
+        temp_array[v] += 1
+    out = []
+    for i, c in enumerate(temp_array):
+        out.extend([i] * c)
+    return out
+
+
+def quicksort_py(arr):
+    if len(arr) <= 1:
+        return arr
+    pivot = arr[len(arr) // 2]
+    left, middle, right = [], [], []
+    for x in arr:
+        if x < pivot:
+            left.append(x)
+        elif x > pivot:
+            right.append(x)
+        else:
+            middle.append(x)
+    return quicksort_py(left) + middle + quicksort_py(right)
+
+
+# ---------------------------------------
+# REGISTRY
+# ---------------------------------------
+def _array(keys):
+    return keys.copy()
+
+
+def _list(keys):
+    return keys.tolist()
+
+
+# name: (sort function, input preparation, largest n, largest value range,
+# result checked). Preparation is not timed; None means no limit. The
+# pure-Python sorts are capped where they would run for minutes or allocate
+# value-range-sized lists; the legacy *_benchmarks ones only time the work
+# and do not return the full sorted list, so their output is not checked.
+ENGINES = {
+    "np.sort": (np.sort, _array, None, None, True),
+    "dispatch": (sort, _array, None, None, True),
+    "counting": (counting_sort_numpy, _array, None, 1 << 26, True),
+    "bucket": (bucket_sort_numpy, _array, None, None, True),
+    "magnitude": (magnitude_sort_numpy, _array, None, None, True),
+    "units": (units_sort_numpy, _array, None, None, True),
+    "sample_bucket": (sample_bucket_sort, _array, None, None, True),
+    "sparse": (sparse_counting_sort, _array, None, None, True),
+    "radix": (radix_sort, _array, None, None, True),
+    "american_flag": (american_flag_sort, _array, None, None, True),
+    "threaded": (threaded_sort, _array, None, None, True),
+    "py.sorted": (sorted, _list, 10**6, None, True),
+    "py.quicksort": (quicksort_py, _list, 10**5, None, True),
+    "py.counting_original": (counting_sort_original, _list, 10**6, 10**7, True),
+    "py.magnitude": (better_magnitude_sorting_benchmarks, _list, 10**6, 10**7, True),
+    "py.better_sorting": (better_sorting_benchmarks, _list, 10**6, 10**7, False),
+    "py.units": (better_sorting_by_units_benchmarks, _list, 10**6, 10**7, False),
+}
+
+DEFAULT_ENGINES = [name for name in ENGINES if not name.startswith("py.")]
+
+
+# ---------------------------------------
+# MEASUREMENT
+# ---------------------------------------
+def _fits(engine, n, value_range):
+    _, _, max_n, max_range, _ = ENGINES[engine]
+    return (max_n is None or n <= max_n) and (max_range is None or value_range <= max_range)
+
+
+def run_case(engine, keys, repeats=REPEATS, warmup=WARMUP):
+    """Time one engine on one input; returns median / IQR / min / max / times and
+    ok: whether the output matched np.sort (None for engines that are not checked)."""
+    function, prepare, _, _, checked = ENGINES[engine]
+    times = []
+    for i in range(warmup + repeats):
+        data = prepare(keys)
+        start = time.perf_counter()
+        result = function(data)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+
+    ok = bool(np.array_equal(np.asarray(result), np.sort(keys))) if checked else None
+    q1, median, q3 = np.percentile(times, [25, 50, 75])
+    return {
+        "median": float(median),
+        "iqr": float(q3 - q1),
+        "min": float(min(times)),
+        "max": float(max(times)),
+        "times": times,
+        "ok": ok,
+    }
+
+
+def run_matrix(engines, distributions, sizes, ranges, repeats=REPEATS, warmup=WARMUP,
+               seed=SEED, cache_dir=DEFAULT_CACHE_DIR, progress=None):
+    """Every engine on every n x range x distribution case; returns the result records."""
+    records = []
+    for distribution in distributions:
+        for n in sizes:
+            for value_range in ranges:
+                keys = load_dataset(distribution, n, value_range, seed, cache_dir)
+                for engine in engines:
+                    case = {"engine": engine, "distribution": distribution, "n": n, "range": value_range}
+                    if _fits(engine, n, value_range):
+                        case.update(run_case(engine, keys, repeats, warmup))
+                    else:
+                        case["skipped"] = True
+                    records.append(case)
+                    if progress is not None:
+                        progress(case)
+    return records
+
+
+# ---------------------------------------
+# PARALLEL EXECUTION
+# ---------------------------------------
+# State of a pool worker process: the core it is pinned to and the queue of
+# free cores it took it from
+_worker = {}
+
+
+def available_cores():
+    """CPU ids this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(cores):
+    # Pool initializer: take a core no other worker holds and stay on it, so
+    # concurrent cases never share a core (or its L1/L2). Pinning is skipped
+    # where sched_setaffinity does not exist (macOS, Windows).
+    core = cores.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    _worker.update(core=core, cores=cores)
+
+
+def _run_task(task):
+    # One case in a pool worker. Counters are tallied here, in the worker,
+    # and travel back with the result; nothing is shared between processes.
+    index, engine, distribution, n, value_range, repeats, warmup, seed, cache_dir, isolated = task
+    try:
+        case = {"engine": engine, "distribution": distribution, "n": n, "range": value_range}
+        counters = {"cases": 1, "runs": 0, "skipped": 0}
+        if _fits(engine, n, value_range):
+            keys = load_dataset(distribution, n, value_range, seed, cache_dir)
+            case.update(run_case(engine, keys, repeats, warmup))
+            counters["runs"] = warmup + repeats
+        else:
+            case["skipped"] = True
+            counters["skipped"] = 1
+        case.update(pid=os.getpid(), core=_worker.get("core"))
+        return index, case, counters
+    finally:
+        if isolated:
+            # This process exits after the task; its replacement gets the core
+            _worker["cores"].put(_worker["core"])
+
+
+def run_parallel(engines, distributions, sizes, ranges, repeats=REPEATS, warmup=WARMUP, seed=SEED,
+                 cache_dir=DEFAULT_CACHE_DIR, workers=None, isolated=False, progress=None):
+    """run_matrix over a pool of worker processes, each pinned to a core of its own.
+
+    workers defaults to one per available core and may not exceed them.
+    With isolated=True every case runs in a fresh process (clean heap,
+    allocator and caches). Returns (records, counters): records in
+    run_matrix order, each with the pid and core that ran it, and counters
+    merged from the workers' local tallies, per pid and in total.
+    """
+    cores = available_cores()
+    workers = workers or len(cores)
+    if workers > len(cores):
+        raise ValueError(f"{workers} workers need as many cores, only {len(cores)} are available")
+
+    # Generate and cache every input up front so workers only ever read them
+    tasks = []
+    for distribution in distributions:
+        for n in sizes:
+            for value_range in ranges:
+                load_dataset(distribution, n, value_range, seed, cache_dir)
+                for engine in engines:
+                    tasks.append((len(tasks), engine, distribution, n, value_range,
+                                  repeats, warmup, seed, cache_dir, isolated))
+
+    context = get_context("spawn")
+    free_cores = context.Queue()
+    for core in cores[:workers]:
+        free_cores.put(core)
+
+    records = [None] * len(tasks)
+    per_worker = {}
+    with context.Pool(workers, _init_worker, (free_cores,), maxtasksperchild=1 if isolated else None) as pool:
+        for index, case, counters in pool.imap_unordered(_run_task, tasks):
+            records[index] = case
+            totals = per_worker.setdefault(case["pid"], dict.fromkeys(counters, 0))
+            for name, value in counters.items():
+                totals[name] += value
+            if progress is not None:
+                progress(case)
+
+    total = {}
+    for totals in per_worker.values():
+        for name, value in totals.items():
+            total[name] = total.get(name, 0) + value
+    return records, {"total": total, "workers": per_worker}
+
+
+def _meta(repeats, warmup, seed):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "repeats": repeats,
+        "warmup": warmup,
+        "seed": seed,
+    }
+
+
+# ---------------------------------------
+# BASELINE COMPARISON
+# ---------------------------------------
+def _case_key(record):
+    return (record["engine"], record["distribution"], record["n"], record["range"])
+
+
+def compare(records, baseline_records, threshold=REGRESSION_THRESHOLD):
+    """Cases whose median is more than threshold slower than the baseline's and
+    slower by more than both runs' IQRs added up; slowest first."""
+    baseline = {_case_key(r): r for r in baseline_records if "median" in r}
+    regressions = []
+    for record in records:
+        before = baseline.get(_case_key(record))
+        if before is None or "median" not in record or before["median"] <= 0:
+            continue
+        ratio = record["median"] / before["median"]
+        noise = record["iqr"] + before.get("iqr", 0.0)
+        if ratio > 1 + threshold and record["median"] - before["median"] > noise:
+            regressions.append(dict(record, baseline_median=before["median"], ratio=ratio))
+    return sorted(regressions, key=lambda r: -r["ratio"])
+
+
+def unmatched(records, baseline_records):
+    """Measured cases compare() could not check: the baseline has no timing for them."""
+    baseline = {_case_key(r) for r in baseline_records if "median" in r}
+    return [r for r in records if "median" in r and _case_key(r) not in baseline]
+
+
+# ---------------------------------------
+# COMMAND LINE
+# ---------------------------------------
+def _int(text):
+    # Accepts 1000000, 1_000_000 and 1e6
+    try:
+        return int(text.replace("_", ""))
+    except ValueError:
+        return int(float(text))
+
+
+def _print_case(case):
+    label = f"{case['engine']:>22} {case['distribution']:>14} n={case['n']:<10,} range={case['range']:<16,}"
+    if case.get("skipped"):
+        print(f"{label} skipped")
+    else:
+        flag = "  WRONG RESULT" if case["ok"] is False else ""
+        print(f"{label} median {case['median']:.5f} s  iqr {case['iqr']:.5f} s{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sort engines over a matrix of inputs.")
+    parser.add_argument("--engines", nargs="+", default=DEFAULT_ENGINES,
+                        help=f"engines to run, or 'all' (default: {' '.join(DEFAULT_ENGINES)})")
+    parser.add_argument("--distributions", nargs="+", default=DEFAULT_DISTRIBUTIONS, choices=sorted(DISTRIBUTIONS))
+    parser.add_argument("--sizes", nargs="+", type=_int, default=DEFAULT_SIZES)
+    parser.add_argument("--ranges", nargs="+", type=_int, default=DEFAULT_RANGES)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown that counts as a regression (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="run cases in this many processes, each pinned to its own core (0: one per core)")
+    parser.add_argument("--isolated", action="store_true", help="run every case in a fresh process")
+    parser.add_argument("--quiet", action="store_true", help="do not print every case")
+    args = parser.parse_args(argv)
+
+    engines = list(ENGINES) if args.engines == ["all"] else args.engines
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        parser.error(f"unknown engines {unknown}; known: {list(ENGINES)}")
+
+    progress = None if args.quiet else _print_case
+    meta = _meta(args.repeats, args.warmup, args.seed)
+    if args.workers == 1 and not args.isolated:
+        records = run_matrix(
+            engines, args.distributions, args.sizes, args.ranges, args.repeats, args.warmup,
+            args.seed, args.cache_dir, progress,
+        )
+    else:
+        try:
+            records, counters = run_parallel(
+                engines, args.distributions, args.sizes, args.ranges, args.repeats, args.warmup,
+                args.seed, args.cache_dir, args.workers or None, args.isolated, progress,
+            )
+        except ValueError as error:
+            parser.error(str(error))
+        meta.update(workers=len(counters["workers"]), isolated=args.isolated, counters=counters)
+        print(f"{counters['total']['cases']} cases, {counters['total']['runs']} runs "
+              f"on {len(counters['workers'])} worker processes")
+    report = {"meta": meta, "results": records}
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    wrong = [r for r in records if r.get("ok") is False]
+    for record in wrong:
+        print(f"WRONG RESULT: {record['engine']} on {record['distribution']} n={record['n']} range={record['range']}")
+    if wrong:
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_records = json.load(f)["results"]
+        regressions = compare(records, baseline_records, args.threshold)
+        missing = unmatched(records, baseline_records)
+        compared = sum("median" in r for r in records) - len(missing)
+        if missing:
+            print(f"{len(missing)} cases have no match in {args.baseline} and were not compared")
+        for r in regressions:
+            print(
+                f"REGRESSION: {r['engine']} on {r['distribution']} n={r['n']} range={r['range']}: "
+                f"{r['baseline_median']:.5f} s -> {r['median']:.5f} s ({r['ratio']:.2f}x)"
+            )
+        if not compared:
+            print(f"NO BASELINE MATCH: none of the cases run appear in {args.baseline}")
+            status = 1
+        elif regressions:
+            status = 1
+        else:
+            print(f"no regressions above {args.threshold:.0%} in {compared} cases against {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
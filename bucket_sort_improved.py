@@ -1,9 +1,11 @@
 import numpy as np
 import time
 import math
-import csv
 import os
 
+from dataset_generator import load_dataset
+from result_writers import FORMAT_EXTENSIONS, write_result
+
 def normal_sorting():
     # Generate Array with numbers
     array = np.zeros(2000)
@@ -34,7 +36,7 @@ def normal_sorting():
     print(sorted_array)
     print("Counting sort time:", end - start)
 
-def better_sorting():
+def better_sorting(fmt="csv"):
     # Generate Array with numbers
     array = np.zeros(200000)
 
@@ -83,18 +85,14 @@ def better_sorting():
 
     os.makedirs("results", exist_ok=True)
     filepath = os.path.join("results", "better_sorting")
-    with open(filepath, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(sorted_array)  
+    write_result(sorted_array, filepath, fmt=fmt)
     
-def better_sorting_log():
+def better_sorting_log(fmt="csv"):
     timings = {}
 
     # ---------------- GENERATE ARRAY ----------------
     start = time.perf_counter()
-    array = np.zeros(2_000_000, dtype=np.int64)
-    for i in range(len(array)):
-        array[i] = np.random.randint(0, 10**10, dtype=np.int64)
+    array = load_dataset("uniform", 2_000_000, 10**10)
     timings["generate_array"] = time.perf_counter() - start
 
     # ---------------- FIND MAX ----------------
@@ -149,10 +147,8 @@ def better_sorting_log():
     # ---------------- SAVE RESULTS ----------------
     start = time.perf_counter()
     os.makedirs("results", exist_ok=True)
-    filepath = os.path.join("results", "better_sorting.csv")
-    with open(filepath, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(sorted_array)
+    filepath = os.path.join("results", "better_sorting" + FORMAT_EXTENSIONS[fmt])
+    write_result(np.asarray(sorted_array), filepath, fmt=fmt)
     timings["save_results"] = time.perf_counter() - start
 
     # ---------------- LOG TIMINGS ----------------
@@ -0,0 +1,450 @@
+import numpy as np
+
+from instrumentation import add_fields, bucket_stats, instrumented, phase
+from key_transform import check_out, decode_keys, encode_keys
+from sparse_counting import _repeat, _sparse_counting_sort
+from tuning import thresholds_for
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Largest number of counter slots a single counting pass may allocate.
+# Buckets are counted together while their tables fit in this budget.
+MAX_COUNT_TABLE = 1 << 22
+
+# A bucket whose table would need more than this many slots per element is
+# counted sparsely: only the values present get a counter.
+SPARSE_TABLE_RATIO = 8
+
+# Count tables use the narrowest of these that the largest possible count fits
+COUNT_DTYPES = tuple(np.dtype(t) for t in (np.uint8, np.uint16, np.uint32, np.uint64))
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+MAX_UINT64 = int(np.iinfo(np.uint64).max)
+
+# Keys drawn to place sample_partition boundaries
+SAMPLE_SIZE = 1 << 14
+
+POWERS_OF_TEN = np.array([10**i for i in range(19)], dtype=np.int64)
+
+# Narrowest bucket bucket_sort_numpy picks by default. The best width is set
+# by the cache its count tables have to fit, so the host's calibrated value
+# (calibrate.py) replaces this one at first use.
+MIN_BUCKET_SIZE = 100_000
+_tuned = False
+
+
+# ---------------------------------------
+# TUNING
+# ---------------------------------------
+def _load_tuning():
+    global MIN_BUCKET_SIZE, _tuned
+    MIN_BUCKET_SIZE = thresholds_for("bucket_sort_numpy").get("MIN_BUCKET_SIZE", MIN_BUCKET_SIZE)
+    _tuned = True
+
+
+# ---------------------------------------
+# WORKSPACE
+# ---------------------------------------
+class SortWorkspace:
+    """Scratch memory reused across calls: count tables and an int64 key buffer.
+
+    Passing the same workspace to repeated sorts carves their count tables
+    out of one growing buffer per dtype instead of allocating them per call.
+    Results never live in the workspace, so it can be reused right away.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._keys = np.zeros(0, dtype=np.int64)
+
+    def table(self, size, dtype):
+        """Zeroed count table of size slots, a view of the cached buffer."""
+        dtype = np.dtype(dtype)
+        buffer = self._tables.get(dtype)
+        if buffer is None or len(buffer) < size:
+            grown = size if buffer is None else max(size, 2 * len(buffer))
+            buffer = self._tables[dtype] = np.empty(grown, dtype=dtype)
+        table = buffer[:size]
+        table.fill(0)
+        return table
+
+    def keys(self, n):
+        """Uninitialized int64 buffer of n keys."""
+        if len(self._keys) < n:
+            self._keys = np.empty(max(n, 2 * len(self._keys)), dtype=np.int64)
+        return self._keys[:n]
+
+
+def count_dtype(max_count):
+    """Narrowest unsigned dtype that can hold a counter reaching max_count."""
+    for dtype in COUNT_DTYPES:
+        if max_count <= np.iinfo(dtype).max:
+            return dtype
+    raise OverflowError(f"no count dtype holds {max_count}")
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _as_int64(array):
+    # Order-preserving int64 keys for any supported dtype
+    return encode_keys(array)[0]
+
+
+def _offsets(values, lo):
+    # values - lo as uint64: exact even when the range does not fit in int64
+    return (values - lo).view(np.uint64)
+
+
+def _span(values):
+    return int(values.max()) - int(values.min()) + 1
+
+
+def _key_out(out, n, dtype, workspace=None):
+    # Where an engine builds its int64 result when the caller passed out:
+    # out itself when decoding is the identity, otherwise scratch space that
+    # decode_keys then copies from. None means "allocate as usual".
+    if out is None:
+        return None
+    check_out(out, n, dtype)
+    if dtype == np.int64:
+        return out
+    return workspace.keys(n) if workspace is not None else None
+
+
+def _trivial(values, dtype, out):
+    # Inputs of zero or one key are already sorted
+    return decode_keys(values if out is not None else values.copy(), dtype, out)
+
+
+def _count_slots(slots, size, max_count, workspace=None):
+    # Counting table in the narrowest dtype max_count fits. np.add.at with a
+    # scalar of the table's own dtype runs as fast as bincount and, unlike
+    # it, fills a uint8/uint16/uint32 table directly.
+    dtype = count_dtype(max_count)
+    table = np.zeros(size, dtype=dtype) if workspace is None else workspace.table(size, dtype)
+    np.add.at(table, slots, dtype.type(1))
+    add_fields(count_tables=1, table_bytes=table.nbytes)
+    return table
+
+
+def _expand_slots(slot_counts, lows, widths, out=None):
+    # The per-bucket tables are laid out one after another, so slot s of
+    # bucket i holds lows[i] + (s - start[i]). Only occupied slots are
+    # turned back into values.
+    starts = np.cumsum(widths) - widths
+    occupied = np.flatnonzero(slot_counts)
+    owner = np.searchsorted(starts, occupied, side="right") - 1
+    return _repeat(lows[owner] - starts[owner] + occupied, slot_counts[occupied], out)
+
+
+def _counting_sort_range(values, lo, hi, out=None, workspace=None):
+    with phase("count", elements=len(values)):
+        counts = _count_slots(values - lo, int(hi - lo) + 1, len(values), workspace)
+    with phase("expand"):
+        occupied = np.flatnonzero(counts)
+        return _repeat(occupied + lo, counts[occupied], out)
+
+
+def _counting_order(offsets, k):
+    # Stable permutation that sorts offsets in [0, k). Each 16-bit digit is
+    # one counting pass: NumPy's stable sort on uint16 is a histogram +
+    # prefix-sum scatter in C, so ranges up to 2**16 need a single pass.
+    order = None
+    for shift in range(0, max(1, int(k - 1).bit_length()), 16):
+        current = offsets if order is None else offsets[order]
+        digits = ((current >> shift) & 0xFFFF).astype(np.uint16)
+        perm = np.argsort(digits, kind="stable")
+        order = perm if order is None else order[perm]
+    return order
+
+
+def _bucket_bounds(values, ids, num_buckets):
+    counts = np.bincount(ids, minlength=num_buckets)
+    bucket_min = np.full(num_buckets, INT64_MAX, dtype=np.int64)
+    bucket_max = np.full(num_buckets, INT64_MIN, dtype=np.int64)
+    np.minimum.at(bucket_min, ids, values)
+    np.maximum.at(bucket_max, ids, values)
+    return counts, bucket_min, bucket_max
+
+
+def _magnitude_width(R, n):
+    # (bucket_size, num_buckets) for ~sqrt(n) equal-width buckets over a span
+    # of R. A full 64-bit span over fewer than 4 keys would make one bucket
+    # 2**64 wide, which uint64 cannot hold; one short of it takes two buckets.
+    approx_buckets = max(1, int(np.sqrt(n)))
+    bucket_size = min(max(1, R // approx_buckets), MAX_UINT64)
+    return bucket_size, (R + bucket_size - 1) // bucket_size
+
+
+def _magnitude_buckets(values):
+    # ~sqrt(n) equal-width buckets over [min, max]
+    bucket_size, num_buckets = _magnitude_width(_span(values), len(values))
+    ids = _offsets(values, values.min()) // np.uint64(bucket_size)
+    return ids.astype(np.int64), num_buckets
+
+
+def _ranges(starts, lengths):
+    # Concatenation of [starts[i], starts[i] + lengths[i]) for every i
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+
+def _sample_splitters(values, parts, sample_size, seed=None):
+    # Boundaries at quantiles of a strided sample (a random one when seeded),
+    # so the ranges between them hold ~len(values)/parts keys each;
+    # duplicates are merged.
+    if seed is None:
+        sample = values[:: max(1, len(values) // sample_size)]
+    else:
+        rng = np.random.default_rng(seed)
+        sample = values[rng.integers(0, len(values), min(len(values), sample_size))]
+    sample = np.sort(sample)
+    cuts = sample[(np.arange(1, parts) * len(sample)) // parts]
+    return np.unique(cuts)
+
+
+def _dense_bucket_sort(values, ids, nonempty, bucket_min, widths, max_count, out=None, workspace=None):
+    # Counting tables of the given buckets laid out back to back; no bucket
+    # holds more than max_count keys, which sizes the counters.
+    lows = bucket_min[nonempty]
+
+    # Split the buckets into batches whose tables fit in MAX_COUNT_TABLE;
+    # a bucket wider than the budget gets its own batch.
+    ends = np.cumsum(widths)
+    window = (ends - widths) // MAX_COUNT_TABLE
+    batch_of_bucket = np.concatenate(([0], np.cumsum(np.diff(window) != 0)))
+    num_batches = int(batch_of_bucket[-1]) + 1
+
+    slot_base = np.zeros(len(bucket_min), dtype=np.int64)
+    slot_base[nonempty] = ends - widths
+
+    if num_batches == 1:
+        slots = slot_base[ids] + (values - bucket_min[ids])
+        slot_counts = _count_slots(slots, int(ends[-1]), max_count, workspace)
+        return _expand_slots(slot_counts, lows, widths, out)
+
+    # Group elements by batch so each batch is one contiguous slice
+    batch = np.zeros(len(bucket_min), dtype=np.int64)
+    batch[nonempty] = batch_of_bucket
+    element_batch = batch[ids]
+    order = np.argsort(element_batch, kind="stable")
+    grouped = values[order]
+    grouped_ids = ids[order]
+    batch_sizes = np.bincount(element_batch, minlength=num_batches)
+    batch_starts = np.cumsum(batch_sizes) - batch_sizes
+
+    if out is None:
+        out = np.empty(len(values), dtype=np.int64)
+    first = np.searchsorted(batch_of_bucket, np.arange(num_batches))
+    last = np.append(first[1:], len(nonempty))
+    for b in range(num_batches):
+        lo, hi = first[b], last[b]
+        start = batch_starts[b]
+        stop = start + batch_sizes[b]
+        part = grouped[start:stop]
+        part_ids = grouped_ids[start:stop]
+        base = slot_base[nonempty[lo]]
+        slots = slot_base[part_ids] - base + (part - bucket_min[part_ids])
+        slot_counts = _count_slots(slots, int(ends[hi - 1] - base), max_count, workspace)
+        _expand_slots(slot_counts, lows[lo:hi], widths[lo:hi], out[start:stop])
+    return out
+
+
+def _bucket_counting_sort(values, ids, num_buckets, out=None, workspace=None):
+    # Shared core of the bucket engines: every element already knows its
+    # bucket, buckets are ordered by value, and each bucket gets its own
+    # counting table spanning [bucket_min, bucket_max]. Buckets that would
+    # be mostly empty slots are counted sparsely instead.
+    with phase("distribute_buckets", elements=len(values)) as p:
+        counts, bucket_min, bucket_max = _bucket_bounds(values, ids, num_buckets)
+
+        nonempty = np.flatnonzero(counts)
+        spans = _offsets(bucket_max[nonempty], bucket_min[nonempty])
+        sparse = spans >= SPARSE_TABLE_RATIO * counts[nonempty]
+        widths = spans.astype(np.int64) + 1
+        max_count = int(counts.max())
+        if p:
+            p.record(**bucket_stats(counts), sparse_buckets=int(sparse.sum()))
+
+    if not sparse.any():
+        with phase("counting_sort_buckets", elements=len(values)):
+            return _dense_bucket_sort(values, ids, nonempty, bucket_min, widths, max_count, out, workspace)
+    if sparse.all():
+        with phase("counting_sort_buckets", elements=len(values)):
+            return _sparse_counting_sort(values, out)
+
+    # Both kinds present: each side is sorted on its own and written to the
+    # output ranges its buckets own. Both are sorted before anything is
+    # written, so out may be the input's own buffer.
+    starts = np.cumsum(counts) - counts
+    is_sparse = np.zeros(num_buckets, dtype=bool)
+    is_sparse[nonempty[sparse]] = True
+    element_sparse = is_sparse[ids]
+
+    dense_buckets = nonempty[~sparse]
+    dense = ~element_sparse
+    with phase("counting_sort_buckets", elements=len(values)):
+        dense_sorted = _dense_bucket_sort(
+            values[dense], ids[dense], dense_buckets, bucket_min, widths[~sparse], max_count, workspace=workspace
+        )
+        sparse_sorted = _sparse_counting_sort(values[element_sparse])
+
+    with phase("merge_buckets"):
+        if out is None:
+            out = np.empty(len(values), dtype=np.int64)
+        out[_ranges(starts[dense_buckets], counts[dense_buckets])] = dense_sorted
+        sparse_buckets = nonempty[sparse]
+        out[_ranges(starts[sparse_buckets], counts[sparse_buckets])] = sparse_sorted
+    return out
+
+
+# ---------------------------------------
+# COUNTING SORT
+# ---------------------------------------
+# Every engine takes out= (an array of the input's length and dtype to write
+# the result into, returned instead of a new array) and workspace= (a
+# SortWorkspace whose buffers replace the per-call count tables). While an
+# instrumentation sink is set, each call reports its phases to it.
+@instrumented("counting")
+def counting_sort_numpy(array, out=None, workspace=None):
+    """Counting sort over [min, max] with a single counting pass."""
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+    keys = _key_out(out, len(values), dtype, workspace)
+    with phase("find_range"):
+        lo, hi = values.min(), values.max()
+    result = _counting_sort_range(values, lo, hi, keys, workspace)
+    return decode_keys(result, dtype, out)
+
+
+# ---------------------------------------
+# BUCKET SORTS
+# ---------------------------------------
+@instrumented("bucket")
+def bucket_sort_numpy(array, bucket_size=None, out=None, workspace=None):
+    """Vectorized better_sorting_benchmarks: equal-width buckets, counting sort inside."""
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if n <= 1:
+        return _trivial(values, dtype, out)
+
+    with phase("assign_buckets"):
+        R = _span(values)
+        if bucket_size is None:
+            if not _tuned:
+                _load_tuning()
+            bucket_size = max(MIN_BUCKET_SIZE, R // n)
+
+        ids = (_offsets(values, values.min()) // np.uint64(bucket_size)).astype(np.int64)
+        num_buckets = (R - 1) // bucket_size + 1
+    keys = _key_out(out, n, dtype, workspace)
+    return decode_keys(_bucket_counting_sort(values, ids, num_buckets, keys, workspace), dtype, out)
+
+
+@instrumented("magnitude")
+def magnitude_sort_numpy(array, out=None, workspace=None):
+    """Vectorized better_magnitude_sorting_benchmarks: ~sqrt(n) equal-width buckets."""
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+
+    with phase("assign_buckets"):
+        ids, num_buckets = _magnitude_buckets(values)
+    keys = _key_out(out, len(values), dtype, workspace)
+    return decode_keys(_bucket_counting_sort(values, ids, num_buckets, keys, workspace), dtype, out)
+
+
+def sample_partition(array, num_buckets=None, sample_size=SAMPLE_SIZE, seed=0):
+    """Bucket boundaries at quantiles of a random sample, in the input's dtype.
+
+    Key x belongs to bucket searchsorted(splitters, x, side="right"), and the
+    buckets hold roughly equal numbers of keys however skewed the input is.
+    Repeated keys merge boundaries, so there may be fewer than num_buckets
+    (default ~sqrt(n)) buckets.
+    """
+    values, dtype = encode_keys(array)
+    if len(values) == 0:
+        return decode_keys(values.copy(), dtype)
+    num_buckets = num_buckets or max(1, int(np.sqrt(len(values))))
+    return decode_keys(_sample_splitters(values, num_buckets, sample_size, seed), dtype)
+
+
+@instrumented("sample_bucket")
+def sample_bucket_sort(array, num_buckets=None, sample_size=SAMPLE_SIZE, seed=0, out=None, workspace=None):
+    """Bucket sort with sample_partition boundaries instead of equal-width buckets.
+
+    Buckets narrow where keys are dense and widen where they are sparse, so
+    uniform, clustered and heavy-tailed inputs all get counting tables of
+    similar size; a bucket that is still too wide for its population is
+    counted sparsely.
+    """
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+
+    num_buckets = num_buckets or max(1, int(np.sqrt(len(values))))
+    with phase("sample_splitters"):
+        splitters = _sample_splitters(values, num_buckets, sample_size, seed)
+    with phase("assign_buckets"):
+        ids = np.searchsorted(splitters, values, side="right")
+    keys = _key_out(out, len(values), dtype, workspace)
+    return decode_keys(_bucket_counting_sort(values, ids, len(splitters) + 1, keys, workspace), dtype, out)
+
+
+@instrumented("units")
+def units_sort_numpy(array, out=None, workspace=None):
+    """Vectorized better_sorting_by_units_benchmarks: one bucket per decimal magnitude."""
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+
+    # Same buckets as int(math.log10(value)), without float rounding;
+    # values <= 0 share bucket 0 as in the list version.
+    with phase("assign_buckets"):
+        ids = np.searchsorted(POWERS_OF_TEN, values, side="right") - 1
+        np.maximum(ids, 0, out=ids)
+    keys = _key_out(out, len(values), dtype, workspace)
+    return decode_keys(_bucket_counting_sort(values, ids, len(POWERS_OF_TEN), keys, workspace), dtype, out)
+
+
+# ---------------------------------------
+# STABLE ARGSORT
+# ---------------------------------------
+def counting_argsort(array):
+    """Stable permutation that sorts the input, built from counting passes over [min, max]."""
+    values = _as_int64(array)
+    if len(values) <= 1:
+        return np.arange(len(values))
+    return _counting_order(_offsets(values, values.min()), _span(values))
+
+
+def bucket_argsort(array):
+    """Stable permutation that sorts the input via magnitude buckets.
+
+    Elements are ordered by their offset inside the bucket first and by bucket
+    second, so no table ever spans more than one bucket's [min, max].
+    """
+    values = _as_int64(array)
+    if len(values) <= 1:
+        return np.arange(len(values))
+
+    ids, num_buckets = _magnitude_buckets(values)
+    counts, bucket_min, bucket_max = _bucket_bounds(values, ids, num_buckets)
+    nonempty = counts > 0
+    widest = int(_offsets(bucket_max[nonempty], bucket_min[nonempty]).max()) + 1
+
+    order = _counting_order(_offsets(values, bucket_min[ids]), widest)
+    return order[_counting_order(ids[order], num_buckets)]
+
+
+def sparse_argsort(array):
+    """Stable permutation that sorts the input, counting over the ranks of the distinct values."""
+    values = _as_int64(array)
+    if len(values) <= 1:
+        return np.arange(len(values))
+    distinct, inverse = np.unique(values, return_inverse=True)
+    return _counting_order(inverse, len(distinct))
@@ -0,0 +1,239 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bucket_sort_numpy import (
+    MAX_COUNT_TABLE,
+    MIN_BUCKET_SIZE,
+    bucket_sort_numpy,
+    counting_sort_numpy,
+    magnitude_sort_numpy,
+)
+from dataset_generator import DEFAULT_SEED, generate
+from radix_sort import radix_sort
+from sort_dispatch import (
+    BUCKET_SLOT_RATIO,
+    DENSE_RANGE_RATIO,
+    RADIX_DIGIT_BITS,
+    RADIX_MAX_PASSES,
+    SMALL_INPUT,
+    SPARSE_CARDINALITY_RATIO,
+    comparison_sort,
+    prescan,
+)
+from sparse_counting import sparse_counting_sort
+from tuning import DEFAULT_PROFILE_PATH, PROFILE_ENV, save_profile
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Keys per input for the range, radix and bucket-width sweeps
+CALIBRATION_N = 1 << 20
+REPEATS = 3
+
+# range / n ratios tried for the counting crossover
+RATIOS = [2.0**k for k in range(-6, 5)]
+
+# Widths of the cluster distribution's key range, as multiples of n, tried
+# for the bucket crossover (a fraction of it ends up in occupied buckets)
+CLUSTER_SPANS = [2**k for k in range(0, 13, 2)]
+
+# Distinct values per key tried for the sparse crossover
+CARDINALITY_RATIOS = [2.0**k for k in range(-16, -1, 2)]
+
+# n tried for the small-input crossover
+SMALL_SIZES = [1 << k for k in range(8, 18)]
+
+# Bucket widths tried for MIN_BUCKET_SIZE, up to one full count table
+BUCKET_SIZES = [1 << k for k in range(10, MAX_COUNT_TABLE.bit_length())]
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _best_time(function, keys, repeats):
+    # Fastest of repeats runs, each on a fresh copy
+    best = float("inf")
+    for _ in range(repeats):
+        data = keys.copy()
+        start = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _race(engine, keys, repeats):
+    # Seconds of the table engine and of np.sort on the same keys
+    return _best_time(engine, keys, repeats), _best_time(comparison_sort, keys, repeats)
+
+
+def _last_winning(points):
+    # points: (x, engine_won) in increasing x. The largest x up to which the
+    # engine won at every point, or None if it lost the first one.
+    best = None
+    for x, won in points:
+        if not won:
+            break
+        best = x
+    return best
+
+
+def _radix(array):
+    return radix_sort(array, digit_bits=RADIX_DIGIT_BITS)
+
+
+# ---------------------------------------
+# SWEEPS
+# ---------------------------------------
+def counting_crossover(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Largest range / n at which counting_sort_numpy still beats np.sort (0 if it never does)."""
+    rows = []
+    for ratio in RATIOS:
+        keys = generate("uniform", n, max(1, int(ratio * n)), seed)
+        counting, comparison = _race(counting_sort_numpy, keys, repeats)
+        rows.append({"ratio": ratio, "counting": counting, "comparison": comparison})
+        progress(f"  counting   range/n={ratio:<9g} {counting:.5f} s  vs np.sort {comparison:.5f} s")
+    return _last_winning((r["ratio"], r["counting"] < r["comparison"]) for r in rows) or 0.0, rows
+
+
+def bucket_crossover(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Largest occupied-bucket-slots / n (as prescan estimates it) at which the
+    dispatcher's bucket engine still beats np.sort on clustered keys."""
+    rows = []
+    for span in CLUSTER_SPANS:
+        keys = generate("clusters", n, span * n, seed)
+        ratio = prescan(keys)["bucket_slots"] / n
+        bucket, comparison = _race(magnitude_sort_numpy, keys, repeats)
+        rows.append({"ratio": ratio, "bucket": bucket, "comparison": comparison})
+        progress(f"  bucket     slots/n={ratio:<9.3g} {bucket:.5f} s  vs np.sort {comparison:.5f} s")
+    rows.sort(key=lambda r: r["ratio"])
+    return _last_winning((r["ratio"], r["bucket"] < r["comparison"]) for r in rows) or 0.0, rows
+
+
+def sparse_crossover(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Largest distinct-values / n (as prescan estimates it) at which
+    sparse_counting_sort still beats np.sort on wide-range keys."""
+    rows = []
+    for ratio in CARDINALITY_RATIOS:
+        distinct = generate("uniform", max(1, int(ratio * n)), seed=seed)
+        keys = np.random.default_rng(seed).choice(distinct, n)
+        estimate = prescan(keys)["cardinality"] / n
+        sparse, comparison = _race(sparse_counting_sort, keys, repeats)
+        rows.append({"ratio": estimate, "sparse": sparse, "comparison": comparison})
+        progress(f"  sparse     distinct/n={estimate:<6.3g} {sparse:.5f} s  vs np.sort {comparison:.5f} s")
+    rows.sort(key=lambda r: r["ratio"])
+    return _last_winning((r["ratio"], r["sparse"] < r["comparison"]) for r in rows) or 0.0, rows
+
+
+def small_input_crossover(ratio, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Smallest n from which counting at range ratio * n beats np.sort for every larger n tried."""
+    rows = []
+    for n in SMALL_SIZES:
+        keys = generate("uniform", n, max(1, int(ratio * n)), seed)
+        counting, comparison = _race(counting_sort_numpy, keys, max(repeats, 5))
+        rows.append({"n": n, "counting": counting, "comparison": comparison})
+        progress(f"  small      n={n:<15,} {counting:.6f} s  vs np.sort {comparison:.6f} s")
+    threshold = 2 * SMALL_SIZES[-1]
+    for row in reversed(rows):
+        if row["counting"] >= row["comparison"]:
+            break
+        threshold = row["n"]
+    return threshold, rows
+
+
+def radix_crossover(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Most RADIX_DIGIT_BITS-wide passes for which radix_sort still beats np.sort (0 if none)."""
+    rows = []
+    for passes in range(1, -(-64 // RADIX_DIGIT_BITS) + 1):
+        value_range = min(1 << (RADIX_DIGIT_BITS * passes), (1 << 63) - 1)
+        keys = generate("uniform", n, value_range, seed)
+        radix, comparison = _race(_radix, keys, repeats)
+        rows.append({"passes": passes, "radix": radix, "comparison": comparison})
+        progress(f"  radix      passes={passes:<10} {radix:.5f} s  vs np.sort {comparison:.5f} s")
+    return _last_winning((r["passes"], r["radix"] < r["comparison"]) for r in rows) or 0, rows
+
+
+def bucket_width(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Fastest bucket_sort_numpy bucket width on uniform keys over the default range."""
+    keys = generate("uniform", n, seed=seed)
+    rows = []
+    for size in BUCKET_SIZES:
+        seconds = _best_time(lambda a: bucket_sort_numpy(a, bucket_size=size), keys, repeats)
+        rows.append({"bucket_size": size, "seconds": seconds})
+        progress(f"  width      bucket_size={size:<10,} {seconds:.5f} s")
+    return min(rows, key=lambda r: r["seconds"])["bucket_size"], rows
+
+
+def calibrate(n=CALIBRATION_N, repeats=REPEATS, seed=DEFAULT_SEED, progress=print):
+    """Measure this host's crossovers; returns (thresholds, measurements).
+
+    thresholds maps "module.CONSTANT" to the value to use, as saved by
+    tuning.save_profile.
+    """
+    counting_ratio, counting_rows = counting_crossover(n, repeats, seed, progress)
+    bucket_ratio, bucket_rows = bucket_crossover(n, repeats, seed, progress)
+    if counting_ratio > 0:
+        small, small_rows = small_input_crossover(counting_ratio, repeats, seed, progress)
+    else:
+        # Counting never wins, so the small-input cutoff never matters
+        small, small_rows = SMALL_INPUT, []
+    sparse_ratio, sparse_rows = sparse_crossover(n, repeats, seed, progress)
+    passes, radix_rows = radix_crossover(n, repeats, seed, progress)
+    width, width_rows = bucket_width(n, repeats, seed, progress)
+
+    thresholds = {
+        "sort_dispatch.DENSE_RANGE_RATIO": counting_ratio,
+        "sort_dispatch.BUCKET_SLOT_RATIO": bucket_ratio,
+        "sort_dispatch.SPARSE_CARDINALITY_RATIO": sparse_ratio,
+        "sort_dispatch.SMALL_INPUT": small,
+        "sort_dispatch.RADIX_MAX_PASSES": passes,
+        "bucket_sort_numpy.MIN_BUCKET_SIZE": width,
+    }
+    measurements = {
+        "n": n,
+        "repeats": repeats,
+        "counting": counting_rows,
+        "bucket": bucket_rows,
+        "sparse": sparse_rows,
+        "small_input": small_rows,
+        "radix": radix_rows,
+        "bucket_width": width_rows,
+    }
+    return thresholds, measurements
+
+
+# ---------------------------------------
+# COMMAND LINE
+# ---------------------------------------
+DEFAULTS = {
+    "sort_dispatch.DENSE_RANGE_RATIO": DENSE_RANGE_RATIO,
+    "sort_dispatch.BUCKET_SLOT_RATIO": BUCKET_SLOT_RATIO,
+    "sort_dispatch.SPARSE_CARDINALITY_RATIO": SPARSE_CARDINALITY_RATIO,
+    "sort_dispatch.SMALL_INPUT": SMALL_INPUT,
+    "sort_dispatch.RADIX_MAX_PASSES": RADIX_MAX_PASSES,
+    "bucket_sort_numpy.MIN_BUCKET_SIZE": MIN_BUCKET_SIZE,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure this host's engine crossovers and save them as its tuning profile.")
+    parser.add_argument("--n", type=int, default=CALIBRATION_N, help="keys per input for the large sweeps (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help=f"profile to write (default: ${PROFILE_ENV} or {DEFAULT_PROFILE_PATH})")
+    parser.add_argument("--dry-run", action="store_true", help="print the thresholds without saving them")
+    args = parser.parse_args(argv)
+
+    thresholds, measurements = calibrate(args.n, args.repeats, args.seed)
+    print()
+    for name, value in thresholds.items():
+        print(f"{name:<36} {DEFAULTS[name]!s:>10} -> {value}")
+    if not args.dry_run:
+        print(f"saved to {save_profile(thresholds, measurements, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
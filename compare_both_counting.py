@@ -2,6 +2,7 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 from bucket_sort_improved import better_sorting_benchmarks
+from benchmark import counting_sort_original
 # ---------------- CONFIG ----------------
 N = 20_000
 REPEATS = 3
@@ -9,27 +10,6 @@ MAX_VALUES = [10**i for i in range(1, 7)]  # 10 → 10.000.000
 
 np.random.seed(42)
 
-# ---------------------------------------
-# Normal Counting sort implementation
-# ---------------------------------------
-
-def counting_sort(arr):
-    max_value = 0
-    for i in range(len(arr)):
-        if max_value < arr[i]:
-            max_value = arr[i]
-
-    temp_array = [0] * (max_value + 1)
-
-    for v in arr:
-        temp_array[v] += 1
-
-    out = []
-    for i, c in enumerate(temp_array):
-        out.extend([i] * c)
-
-    return out
-
 # ---------------------------------------
 # Better Counting sort implementation
 # ---------------------------------------
@@ -51,7 +31,7 @@ for max_val in MAX_VALUES:
         a2 = base.copy()
 
         t0 = time.perf_counter()
-        counting_sort(a1)
+        counting_sort_original(a1)
         ct.append(time.perf_counter() - t0)
 
         t0 = time.perf_counter()
@@ -2,6 +2,7 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 from bucket_sort_improved import better_sorting_benchmarks, better_magnitude_sorting_benchmarks, better_sorting_by_units_benchmarks
+from benchmark import counting_sort_original, quicksort_py
 
 # ---------------- CONFIG ----------------
 N = 10_000
@@ -9,36 +10,6 @@ REPEATS = 3
 MAX_VALUES = [10**i for i in range(1, 9)]  # 10 → 10.000.000
 np.random.seed(42)
 
-# ---------------------------------------
-# COUNTING SORT ORIGINAL 
-# ---------------------------------------
-def counting_sort_original(arr):
-    max_value = max(arr)
-    temp_array = [0] * (max_value + 1)
-    for v in arr:
-        temp_array[v] += 1
-    out = []
-    for i, c in enumerate(temp_array):
-        out.extend([i] * c)
-    return out
-
-# ---------------------------------------
-# Quick sort implementation
-# ---------------------------------------
-def quicksort_py(arr):
-    if len(arr) <= 1:
-        return arr
-    pivot = arr[len(arr) // 2]
-    left, middle, right = [], [], []
-    for x in arr:
-        if x < pivot:
-            left.append(x)
-        elif x > pivot:
-            right.append(x)
-        else:
-            middle.append(x)
-    return quicksort_py(left) + middle + quicksort_py(right)
-
 # ---------------------------------------
 # Benchmark
 # ---------------------------------------
@@ -92,7 +63,7 @@ for max_val in MAX_VALUES:
         # 6. Magnitude by digits counting
         a6 = base.copy().tolist()
         t0 = time.perf_counter()
-        better_sorting_by_units_benchmarks(a4)
+        better_sorting_by_units_benchmarks(a6)
         ddbt.append(time.perf_counter() - t0)
 
     # Promedio de tiempos
@@ -135,6 +106,6 @@ for i in range(len(MAX_VALUES)):
     f"{results['Magnitude bucket'][i]:>12.5f} "
     f"{results['Quicksort Py'][i]:>12.5f} "
     f"{results['Python sort'][i]:>12.5f}"
-    f"{results["Digit magnitude bucket"][i]:>12.5f}"
+    f"{results['Digit magnitude bucket'][i]:>12.5f}"
 )
 print("="*80)
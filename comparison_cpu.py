@@ -2,11 +2,11 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 import math
-from multiprocessing import Pool, cpu_count, freeze_support, set_start_method
+from multiprocessing import Pool, Queue, freeze_support, set_start_method
 import psutil
 import os
 from tqdm import tqdm
-from multiprocessing import Manager
+from benchmark import _init_worker, available_cores, counting_sort_original, quicksort_py
 
 # ---------------- CONFIG ----------------
 N = 10
@@ -15,27 +15,6 @@ MAX_VALUES = [10**i for i in range(8, 14)]
 
 np.random.seed(42)
 
-# ---------------------------------------
-# COUNTING SORT ORIGINAL
-# ---------------------------------------
-def counting_sort_original(arr):
-    max_value = 0
-    for v in arr:
-        if v > max_value:
-            max_value = v
-
-    temp_array = [0] * (max_value + 1)
-
-    for v in arr:
-        temp_array[v] += 1
-
-    out = []
-    for i, c in enumerate(temp_array):
-        out.extend([i] * c)
-
-    return out
-
-
 # ---------------------------------------
 # BETTER SORT
 # ---------------------------------------
@@ -83,37 +62,16 @@ def better_sorting_benchmarks(array):
     return result
 
 
-# ---------------------------------------
-# QUICK SORT
-# ---------------------------------------
-def quicksort_py(arr):
-    if len(arr) <= 1:
-        return arr
-
-    pivot = arr[len(arr) // 2]
-
-    left, middle, right = [], [], []
-
-    for x in arr:
-        if x < pivot:
-            left.append(x)
-        elif x > pivot:
-            right.append(x)
-        else:
-            middle.append(x)
-
-    return quicksort_py(left) + middle + quicksort_py(right)
-
-
 # ---------------------------------------
 # WORKER PARALLELO
 # ---------------------------------------
 def run_benchmark(args):
 
-    base, max_val, stats = args
+    base, max_val = args
 
+    # Counted locally and returned with the timings; the parent adds them up
+    stats = {"lists": 0, "tasks_done": 0, "max_rss_growth_mb": 0.0}
     proc = psutil.Process(os.getpid())
-    ram_mb = proc.memory_info().rss / 1024**2
     ct_orig, ct_better, qt = [], [], []
 
     for r in range(REPEATS):
@@ -144,19 +102,14 @@ def run_benchmark(args):
         mem1 = proc.memory_info().rss
 
         stats["tasks_done"] += 1
-
-        print(
-            f"[PID {os.getpid()}] "
-            f"repeat={r}  "
-            f"RAM={(mem1-mem0)/1e6:.1f}MB  "
-            f"lists={stats['lists']}"
-            f" RAM = {ram_mb}"
-        )
+        stats["max_rss_growth_mb"] = max(stats["max_rss_growth_mb"], (mem1 - mem0) / 1024**2)
 
     return (
+        max_val,
         sum(ct_orig)/REPEATS,
         sum(ct_better)/REPEATS,
-        sum(qt)/REPEATS
+        sum(qt)/REPEATS,
+        stats,
     )
 
 
@@ -164,24 +117,23 @@ def run_benchmark(args):
 # MAIN (🔥 OBLIGATORIO EN WINDOWS 🔥)
 # ---------------------------------------
 def main():
-    from multiprocessing import Manager
-
-    manager = Manager()
-    stats = manager.dict()
-    stats["lists"] = 0
-    stats["tasks_done"] = 0
-
     tasks = []
 
     for max_val in MAX_VALUES:
         base = np.random.randint(0, max_val, size=N, dtype=np.int64)
-        tasks.append((base, max_val, stats))
+        tasks.append((base, max_val))
+
+    # One worker per core, each pinned to its own so timings do not interfere
+    cores = available_cores()
+    free_cores = Queue()
+    for core in cores:
+        free_cores.put(core)
 
-    print(f"\n🔥 Using {cpu_count()} cores\n")
+    print(f"\n🔥 Using {len(cores)} cores\n")
 
     results = []
 
-    with Pool(processes=cpu_count()) as p:
+    with Pool(len(cores), _init_worker, (free_cores,)) as p:
 
         for r in tqdm(
             p.imap_unordered(run_benchmark, tasks),
@@ -190,10 +142,21 @@ def main():
         ):
             results.append(r)
 
+    # imap_unordered hands results back as they finish
+    results.sort(key=lambda r: r[0])
+
+    stats = {"lists": 0, "tasks_done": 0, "max_rss_growth_mb": 0.0}
+    for r in results:
+        stats["lists"] += r[4]["lists"]
+        stats["tasks_done"] += r[4]["tasks_done"]
+        stats["max_rss_growth_mb"] = max(stats["max_rss_growth_mb"], r[4]["max_rss_growth_mb"])
+    print(f"{stats['tasks_done']} repeats, {stats['lists']} lists, "
+          f"largest RSS growth {stats['max_rss_growth_mb']:.1f} MB")
+
     # ---------------- unpack results
-    counting_original_avg = [r[0] for r in results]
-    counting_better_avg = [r[1] for r in results]
-    quick_avg = [r[2] for r in results]
+    counting_original_avg = [r[1] for r in results]
+    counting_better_avg = [r[2] for r in results]
+    quick_avg = [r[3] for r in results]
 
     # ---------------- THEORETICAL
     theoretical_counting = [N + k for k in MAX_VALUES]
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+DEFAULT_CACHE_DIR = "datasets"
+DEFAULT_RANGE = 10**10
+DEFAULT_SEED = 42
+
+ZIPF_EXPONENT = 1.2
+CLUSTERS = 8
+CLUSTER_WIDTH = 1e-3  # standard deviation as a fraction of the range
+NEARLY_SORTED_SWAPS = 0.01  # fraction of keys moved out of place
+FEW_DISTINCT = 16
+ADVERSARIAL_OUTLIERS = 0.01  # fraction of keys spread over the whole range
+
+
+# ---------------------------------------
+# DISTRIBUTIONS
+# ---------------------------------------
+# Every generator returns n int64 keys in [0, value_range) and draws only
+# from the Generator it is given, so (n, value_range, seed) fixes the data.
+def _uniform(rng, n, value_range):
+    return rng.integers(0, value_range, n, dtype=np.int64)
+
+
+def _zipf(rng, n, value_range):
+    # Heavy-tailed IDs: a few small keys take most of the mass
+    return np.minimum(rng.zipf(ZIPF_EXPONENT, n) - 1, value_range - 1).astype(np.int64)
+
+
+def _clusters(rng, n, value_range):
+    centers = rng.uniform(0, value_range, CLUSTERS)
+    keys = rng.normal(centers[rng.integers(0, CLUSTERS, n)], CLUSTER_WIDTH * value_range)
+    return np.clip(keys, 0, value_range - 1).astype(np.int64)
+
+
+def _sorted(rng, n, value_range):
+    return np.sort(_uniform(rng, n, value_range))
+
+
+def _reverse_sorted(rng, n, value_range):
+    return _sorted(rng, n, value_range)[::-1].copy()
+
+
+def _nearly_sorted(rng, n, value_range):
+    keys = _sorted(rng, n, value_range)
+    moved = rng.choice(n, size=int(n * NEARLY_SORTED_SWAPS), replace=False)
+    keys[moved] = keys[rng.permutation(moved)]
+    return keys
+
+
+def _few_distinct(rng, n, value_range):
+    return rng.choice(_uniform(rng, FEW_DISTINCT, value_range), n)
+
+
+def _adversarial(rng, n, value_range):
+    # Nearly every key in a narrow band at the bottom, the rest spread up to
+    # the top: the range is wide, so equal-width buckets and counting tables
+    # see one crowded bucket and a huge empty span.
+    keys = rng.integers(0, min(value_range, max(1, n)), n, dtype=np.int64)
+    outliers = rng.random(n) < ADVERSARIAL_OUTLIERS
+    keys[outliers] = _uniform(rng, int(outliers.sum()), value_range)
+    return keys
+
+
+DISTRIBUTIONS = {
+    "uniform": _uniform,
+    "zipf": _zipf,
+    "clusters": _clusters,
+    "sorted": _sorted,
+    "reverse_sorted": _reverse_sorted,
+    "nearly_sorted": _nearly_sorted,
+    "few_distinct": _few_distinct,
+    "adversarial": _adversarial,
+}
+
+
+# ---------------------------------------
+# GENERATION / CACHE
+# ---------------------------------------
+def generate(distribution, n, value_range=DEFAULT_RANGE, seed=DEFAULT_SEED):
+    """n int64 keys in [0, value_range) drawn from one of DISTRIBUTIONS, fully vectorized."""
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution {distribution!r}; expected one of {sorted(DISTRIBUTIONS)}")
+    if value_range < 1:
+        raise ValueError(f"value_range must be at least 1, got {value_range}")
+    return DISTRIBUTIONS[distribution](np.random.default_rng(seed), n, value_range)
+
+
+def cache_path(distribution, n, value_range=DEFAULT_RANGE, seed=DEFAULT_SEED, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, f"{distribution}-n{n}-r{value_range}-s{seed}.npy")
+
+
+def load_dataset(distribution, n, value_range=DEFAULT_RANGE, seed=DEFAULT_SEED, cache_dir=DEFAULT_CACHE_DIR):
+    """Same keys as generate(), read from a .npy cache keyed by the parameters.
+
+    The first call generates and saves the file; later calls only load it.
+    cache_dir=None skips the cache.
+    """
+    if cache_dir is None:
+        return generate(distribution, n, value_range, seed)
+
+    path = cache_path(distribution, n, value_range, seed, cache_dir)
+    if os.path.exists(path):
+        return np.load(path)
+
+    keys = generate(distribution, n, value_range, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under a temporary name so a concurrent reader never sees half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, keys)
+    os.replace(tmp, path)
+    return keys
@@ -0,0 +1,224 @@
+import os
+import tempfile
+
+import numpy as np
+
+from bucket_sort_numpy import _sample_splitters
+from key_transform import decode_keys, encode_keys
+from sort_dispatch import sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+DEFAULT_MEMORY_LIMIT = 256 * 1024**2
+
+# Bytes held per key while a partition is sorted: the loaded keys, the
+# engine's output and its temporaries, and the decoded copy.
+SORT_BYTES_PER_KEY = 8 * 4
+
+# Bytes held per key while a chunk is routed to spill files: the chunk, its
+# range ids, the grouping permutation and the grouped copy.
+SPILL_BYTES_PER_KEY = 8 * 8
+
+# Spill files kept open at once during the partition pass. Every range
+# between splitters and every splitter's own range has one, so a pass cuts
+# at most (MAX_SPILL_FILES + 1) // 2 ranges; larger inputs recurse.
+MAX_SPILL_FILES = 511
+
+# The splitter sample is read as evenly spaced contiguous blocks: a strided
+# sample would touch (and keep resident) one page per sampled key.
+SAMPLE_SIZE = 1 << 16
+SAMPLE_BLOCKS = 64
+
+# Bytes held per sampled key: the blocks read, their concatenation, the
+# sorted copy and slack for the splitters. Budgets too small for SAMPLE_SIZE
+# keys draw a smaller sample.
+SAMPLE_BYTES_PER_KEY = 8 * 4
+
+
+# ---------------------------------------
+# INPUT / OUTPUT
+# ---------------------------------------
+# Files are only ever mapped one window at a time: a window is mapped,
+# copied or filled, flushed and unmapped again, so touched pages do not pile
+# up in the process's RSS the way they would behind one long-lived memmap.
+class _FileKeys:
+    def __init__(self, path, dtype, n, offset=0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.n = n
+        self.offset = offset
+
+    def __len__(self):
+        return self.n
+
+    def window(self, start, stop, mode="r"):
+        return np.memmap(
+            self.path, dtype=self.dtype, mode=mode,
+            offset=self.offset + start * self.dtype.itemsize, shape=(stop - start,),
+        )
+
+    def read(self, start, stop):
+        if stop <= start:
+            return np.zeros(0, dtype=self.dtype)
+        window = self.window(start, stop)
+        block = np.array(window)
+        del window
+        return block
+
+    def sample(self, size):
+        block = max(1, size // SAMPLE_BLOCKS)
+        starts = np.linspace(0, max(0, self.n - block), SAMPLE_BLOCKS).astype(np.int64)
+        return np.concatenate([self.read(s, min(self.n, s + block)) for s in np.unique(starts)])
+
+    def write(self, start, block):
+        if len(block):
+            window = self.window(start, start + len(block), mode="r+")
+            window[:] = block
+            window.flush()
+            del window
+
+
+class _ArrayKeys:
+    def __init__(self, array):
+        self.array = array
+        self.dtype = array.dtype
+
+    def __len__(self):
+        return len(self.array)
+
+    def read(self, start, stop):
+        return np.array(self.array[start:stop])
+
+    def sample(self, size):
+        return np.array(self.array[:: max(1, len(self.array) // size)])
+
+    def write(self, start, block):
+        self.array[start:start + len(block)] = block
+
+
+def _open_input(src, dtype):
+    if isinstance(src, np.ndarray):
+        return _ArrayKeys(src.reshape(-1))
+    if str(src).endswith(".npy"):
+        header = np.load(src, mmap_mode="r")
+        if header.size == 0:
+            return _ArrayKeys(np.zeros(0, dtype=header.dtype))
+        return _FileKeys(src, header.dtype, header.size, header.offset)
+    dtype = np.dtype(dtype)
+    return _FileKeys(src, dtype, os.path.getsize(src) // dtype.itemsize)
+
+
+def _open_output(dst, dtype, n):
+    if isinstance(dst, np.ndarray):
+        if len(dst) != n:
+            raise ValueError(f"output holds {len(dst)} elements but the input has {n}")
+        return _ArrayKeys(dst.reshape(-1))
+    if str(dst).endswith(".npy"):
+        header = np.lib.format.open_memmap(dst, mode="w+", dtype=dtype, shape=(n,))
+        offset = header.offset
+        del header
+        return _FileKeys(dst, dtype, n, offset)
+    with open(dst, "wb") as f:
+        f.truncate(n * np.dtype(dtype).itemsize)
+    return _FileKeys(dst, dtype, n)
+
+
+def _chunks(n, chunk_size):
+    for start in range(0, n, chunk_size):
+        yield start, min(n, start + chunk_size)
+
+
+def _read(keys, start, stop):
+    # Input chunks and spill files alike come back as int64 keys
+    return encode_keys(keys.read(start, stop))[0]
+
+
+# ---------------------------------------
+# PARTITION / SORT PASSES
+# ---------------------------------------
+def _spill(keys, chunk_size, budget, tmp_dir, depth):
+    # Cut the key range at sample quantiles and append every chunk's keys to
+    # the spill file of its range. Keys equal to a splitter get a range of
+    # their own, so a heavily repeated key can never stall the recursion.
+    # Returns the spill file paths in key order.
+    n = len(keys)
+    parts = min((MAX_SPILL_FILES + 1) // 2, max(2, -(-n * SORT_BYTES_PER_KEY // budget) * 2))
+    sample_size = max(parts, min(SAMPLE_SIZE, budget // SAMPLE_BYTES_PER_KEY))
+    sample = encode_keys(keys.sample(sample_size))[0]
+    splitters = _sample_splitters(sample, parts, sample_size)
+
+    # Unbuffered: every write is a whole grouped slice already, and hundreds
+    # of write buffers would count against the budget
+    paths = [os.path.join(tmp_dir, f"part-{depth}-{p}.bin") for p in range(2 * len(splitters) + 1)]
+    files = [open(path, "wb", buffering=0) for path in paths]
+    try:
+        for start, stop in _chunks(n, chunk_size):
+            block = _read(keys, start, stop)
+            below = np.searchsorted(splitters, block, side="left")
+            ids = 2 * below + (np.searchsorted(splitters, block, side="right") > below)
+            order = np.argsort(ids.astype(np.uint16), kind="stable")
+            counts = np.bincount(ids, minlength=len(paths))
+            grouped = block[order]
+            bounds = np.concatenate(([0], np.cumsum(counts)))
+            for p in np.flatnonzero(counts):
+                grouped[bounds[p]:bounds[p + 1]].tofile(files[p])
+            # Free this chunk before the next one is read
+            del block, below, ids, order, grouped
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _sort_keys_into(keys, out, start, dtype, chunk_size, budget, tmp_dir, depth):
+    # Sort keys (the input or a spill file) into out[start:start + len(keys)]
+    n = len(keys)
+    if n * SORT_BYTES_PER_KEY <= budget:
+        out.write(start, decode_keys(sort(_read(keys, 0, n)), dtype))
+        return
+
+    lo = min(int(_read(keys, a, b).min()) for a, b in _chunks(n, chunk_size))
+    hi = max(int(_read(keys, a, b).max()) for a, b in _chunks(n, chunk_size))
+    if lo == hi:
+        # One repeated key: nothing to order, stream it out
+        for a, b in _chunks(n, chunk_size):
+            out.write(start + a, decode_keys(np.full(b - a, lo, dtype=np.int64), dtype))
+        return
+
+    for path in _spill(keys, chunk_size, budget, tmp_dir, depth):
+        size = os.path.getsize(path) // 8
+        if size:
+            part = _FileKeys(path, np.int64, size)
+            _sort_keys_into(part, out, start, dtype, chunk_size, budget, tmp_dir, depth + 1)
+            start += size
+        os.remove(path)
+
+
+# ---------------------------------------
+# EXTERNAL SORT
+# ---------------------------------------
+def external_sort(src, dst, dtype=np.int64, memory_limit_bytes=DEFAULT_MEMORY_LIMIT, tmp_dir=None):
+    """Sort a dataset that does not fit in memory, keeping peak RSS near memory_limit_bytes.
+
+    src is an ndarray / np.memmap, a .npy file or a raw binary file of dtype;
+    dst is an ndarray / np.memmap of the same length or a path (.npy gets a
+    header, anything else is raw binary). Keys are read in chunks, spilled to
+    per-range temporary files, and every range is sorted in memory with the
+    dispatcher before being written to its slice of the output. Returns dst,
+    or a read-only memmap of it when dst is a path.
+    """
+    keys = _open_input(src, dtype)
+    n = len(keys)
+    out = _open_output(dst, keys.dtype, n)
+
+    budget = max(memory_limit_bytes, SORT_BYTES_PER_KEY)
+    chunk_size = max(1, budget // SPILL_BYTES_PER_KEY)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        _sort_keys_into(keys, out, 0, keys.dtype, chunk_size, budget, tmp, 0)
+
+    if isinstance(out, _ArrayKeys):
+        return dst
+    if n == 0:
+        return np.zeros(0, dtype=keys.dtype)
+    return out.window(0, n)
@@ -0,0 +1,258 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# ---------------------------------------
+# STATE
+# ---------------------------------------
+# The active sink, a callable taking one event dict. None (the default)
+# disables instrumentation: engines then pay one global lookup per phase.
+_sink = None
+
+# Open phases of the current thread, innermost last
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def set_sink(sink):
+    """Send every event to sink (any callable taking the event dict), or None to
+    disable instrumentation; returns the previous sink."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def get_sink():
+    return _sink
+
+
+def enabled():
+    return _sink is not None
+
+
+@contextmanager
+def capture(sink):
+    """Install sink for the duration of a with block; yields it.
+
+        with capture(PhaseStats()) as stats:
+            sort(keys)
+        print(stats.report())
+    """
+    previous = set_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_sink(previous)
+
+
+# ---------------------------------------
+# PHASES
+# ---------------------------------------
+class _Phase:
+    # Times a block and sends {"engine", "phase", "seconds", **fields} to the
+    # sink when it closes. The engine is inherited from the enclosing phase.
+    __slots__ = ("engine", "name", "fields", "_start")
+
+    def __init__(self, name, engine, fields):
+        self.name = name
+        self.engine = engine
+        self.fields = fields
+
+    def __enter__(self):
+        stack = _stack()
+        if self.engine is None and stack:
+            self.engine = stack[-1].engine
+        stack.append(self)
+        # Sinks that measure across a phase (memory_profile) hear when it opens
+        started = getattr(_sink, "phase_started", None)
+        if started is not None:
+            started(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        _stack().pop()
+        event = {"engine": self.engine, "phase": self.name, "seconds": seconds}
+        event.update(self.fields)
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        sink = _sink
+        if sink is not None:
+            sink(event)
+        return False
+
+    def __bool__(self):
+        return True
+
+    def record(self, **fields):
+        """Set fields of this phase's event."""
+        self.fields.update(fields)
+
+    def add(self, **fields):
+        """Add to numeric fields of this phase's event."""
+        for field, value in fields.items():
+            self.fields[field] = self.fields.get(field, 0) + value
+
+
+class _NullPhase:
+    # Returned while disabled: does nothing and is falsy, so engines can skip
+    # computing statistics with "if p: p.record(...)"
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def record(self, **fields):
+        pass
+
+    def add(self, **fields):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name, **fields):
+    """Context manager timing one phase of the running engine."""
+    if _sink is None:
+        return _NULL_PHASE
+    return _Phase(name, None, fields)
+
+
+def add_fields(**fields):
+    """Add to numeric fields of the innermost open phase of this thread."""
+    if _sink is not None:
+        stack = _stack()
+        if stack:
+            stack[-1].add(**fields)
+
+
+def instrumented(name):
+    """Decorator for a sort engine: while a sink is set, each call is a "total"
+    phase of engine name, with the input's length as elements, and every phase
+    opened inside it is attributed to name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(array, *args, **kwargs):
+            if _sink is None:
+                return function(array, *args, **kwargs)
+            elements = len(array) if isinstance(array, (np.ndarray, list, tuple)) else None
+            with _Phase("total", name, {"elements": elements}):
+                return function(array, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bucket_stats(counts):
+    """Occupancy fields for an array of per-bucket key counts.
+
+    occupancy is a histogram over power-of-two bins: bin 0 counts the empty
+    buckets and bin i those holding [2**(i-1), 2**i) keys.
+    """
+    counts = np.asarray(counts)
+    if len(counts) == 0:
+        return {"buckets": 0, "empty_bucket_ratio": 0.0, "largest_bucket": 0, "occupancy": []}
+    empty = int(np.count_nonzero(counts == 0))
+    return {
+        "buckets": len(counts),
+        "empty_bucket_ratio": empty / len(counts),
+        "largest_bucket": int(counts.max()),
+        "occupancy": np.bincount(np.frexp(counts.astype(np.float64))[1]).tolist(),
+    }
+
+
+# ---------------------------------------
+# SINKS
+# ---------------------------------------
+def _format(event):
+    fields = " ".join(
+        f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+        for k, v in event.items()
+        if k not in ("engine", "phase", "seconds")
+    )
+    return f"{event['engine']}.{event['phase']} {event['seconds']:.6f} s {fields}".rstrip()
+
+
+class LogSink:
+    """Sink that logs each event as one line."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("sort.instrumentation")
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s", _format(event))
+
+
+class PhaseStats:
+    """Sink that aggregates events per (engine, phase).
+
+    Each entry holds calls, seconds / min_seconds / max_seconds, and for
+    every numeric field its total and max_<field>; list fields such as
+    occupancy are summed bin by bin. Safe to feed from several threads.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event["engine"], event["phase"])
+        seconds = event["seconds"]
+        with self._lock:
+            entry = self.phases.get(key)
+            if entry is None:
+                entry = self.phases[key] = {"calls": 0, "seconds": 0.0, "min_seconds": seconds, "max_seconds": seconds}
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["min_seconds"] = min(entry["min_seconds"], seconds)
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            for field, value in event.items():
+                if field in ("engine", "phase", "seconds") or value is None or isinstance(value, bool):
+                    continue
+                if isinstance(value, list):
+                    total = entry.setdefault(field, [])
+                    total.extend([0] * (len(value) - len(total)))
+                    for i, v in enumerate(value):
+                        total[i] += v
+                elif isinstance(value, (int, float)):
+                    entry[field] = entry.get(field, 0) + value
+                    entry["max_" + field] = max(entry.get("max_" + field, value), value)
+
+    def clear(self):
+        with self._lock:
+            self.phases.clear()
+
+    def report(self):
+        """One line per (engine, phase): calls, total and mean seconds, totals."""
+        lines = []
+        with self._lock:
+            for (engine_name, phase_name), entry in sorted(self.phases.items(), key=lambda kv: str(kv[0])):
+                extra = " ".join(
+                    f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                    for k, v in entry.items()
+                    if k not in ("calls", "seconds", "min_seconds", "max_seconds")
+                )
+                lines.append(
+                    f"{engine_name}.{phase_name}: {entry['calls']} calls, {entry['seconds']:.6f} s "
+                    f"(mean {entry['seconds'] / entry['calls']:.6f} s) {extra}".rstrip()
+                )
+        return "\n".join(lines)
@@ -0,0 +1,141 @@
+import numpy as np
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+SUPPORTED_DTYPES = tuple(
+    np.dtype(t)
+    for t in (
+        np.int8, np.int16, np.int32, np.int64,
+        np.uint8, np.uint16, np.uint32, np.uint64,
+        np.float32, np.float64,
+    )
+)
+
+NAN_POSITIONS = ("first", "last")
+
+SIGN_BIT = np.uint64(1 << 63)
+
+_UNSIGNED_OF_WIDTH = {4: np.uint32, 8: np.uint64}
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _unsigned_to_int64(keys):
+    # uint32 fits as is; uint64 needs its sign bit flipped to keep the order
+    if keys.dtype == np.uint64:
+        return (keys ^ SIGN_BIT).view(np.int64)
+    return keys.astype(np.int64)
+
+
+def _float_to_unsigned(values, nan_position):
+    # IEEE-754 bit trick: positives get the sign bit set, negatives get every
+    # bit inverted, so unsigned order equals float order (-0.0 sorts just
+    # before 0.0). NaNs are pinned to the lowest or highest key.
+    utype = _UNSIGNED_OF_WIDTH[values.dtype.itemsize]
+    sign = utype(1) << utype(8 * values.dtype.itemsize - 1)
+    bits = values.view(utype)
+    keys = np.where(bits & sign, ~bits, bits | sign)
+
+    nans = np.isnan(values)
+    if nans.any():
+        keys[nans] = 0 if nan_position == "first" else np.iinfo(utype).max
+    return keys
+
+
+def _unsigned_to_float(keys, dtype):
+    utype = _UNSIGNED_OF_WIDTH[dtype.itemsize]
+    sign = utype(1) << utype(8 * dtype.itemsize - 1)
+    bits = np.where(keys & sign, keys ^ sign, ~keys).astype(utype, copy=False)
+    return bits.view(dtype)
+
+
+# ---------------------------------------
+# KEY TRANSFORMS
+# ---------------------------------------
+def encode_keys(array, nan_position="last"):
+    """Map a supported array onto int64 keys with the same order; returns (keys, dtype).
+
+    Integers up to 32 bits unsigned and all signed integers keep their values,
+    so counting ranges stay as small as the data. uint64 and floats go through
+    an order-preserving bit transform.
+    """
+    if nan_position not in NAN_POSITIONS:
+        raise ValueError(f"nan_position must be one of {NAN_POSITIONS}, got {nan_position!r}")
+
+    values = np.asarray(array).ravel()
+    dtype = values.dtype
+    if dtype not in SUPPORTED_DTYPES:
+        names = ", ".join(t.name for t in SUPPORTED_DTYPES)
+        raise TypeError(f"cannot sort keys of dtype {dtype}; supported dtypes are {names}")
+
+    if dtype.kind == "f":
+        return _unsigned_to_int64(_float_to_unsigned(values, nan_position)), dtype
+    if dtype == np.uint64:
+        return _unsigned_to_int64(values), dtype
+    return values.astype(np.int64, copy=False), dtype
+
+
+def cast_keys(array, dtype):
+    """array converted to dtype for a container whose keys already have that dtype.
+
+    Integer -> integer casts of either signedness and casts up the integer ->
+    float kinds are allowed (TypeError otherwise), but only when every value
+    survives: a key the dtype cannot represent exactly raises ValueError
+    instead of wrapping or rounding.
+    """
+    values = np.asarray(array)
+    dtype = np.dtype(dtype)
+    if values.dtype == dtype or np.can_cast(values.dtype, dtype, "safe"):
+        return values.astype(dtype, copy=False)
+    if values.dtype.kind in "iu" and dtype.kind in "iu":
+        # Range checked first, so the unchecked cast below cannot wrap
+        info = np.iinfo(dtype)
+        exact = values.size == 0 or (int(values.min()) >= info.min and int(values.max()) <= info.max)
+        converted = values.astype(dtype, casting="unsafe") if exact else None
+    else:
+        converted = values.astype(dtype, casting="same_kind")
+        with np.errstate(invalid="ignore", over="ignore"):
+            same = converted.astype(values.dtype) == values
+        if values.dtype.kind == "f":
+            same |= np.isnan(values)
+        exact = bool(np.all(same))
+    if not exact:
+        raise ValueError(f"keys of dtype {values.dtype} do not all fit in dtype {dtype}")
+    return converted
+
+
+def check_out(out, n, dtype):
+    """Raise ValueError unless out is a 1-D array of n elements of dtype."""
+    if not isinstance(out, np.ndarray) or out.shape != (n,) or out.dtype != dtype:
+        got = f"{out.shape} {out.dtype}" if isinstance(out, np.ndarray) else type(out).__name__
+        raise ValueError(f"out must be an array of shape ({n},) and dtype {dtype}, got {got}")
+
+
+def decode_keys(keys, dtype, out=None):
+    """Inverse of encode_keys: turn sorted int64 keys back into the original dtype.
+
+    With out, the decoded keys are written into it (integers without a
+    temporary copy) and out is returned.
+    """
+    dtype = np.dtype(dtype)
+    if out is not None:
+        check_out(out, len(keys), dtype)
+        if dtype.kind == "f":
+            out[:] = decode_keys(keys, dtype)
+        elif dtype == np.uint64:
+            np.bitwise_xor(keys.view(np.uint64), SIGN_BIT, out=out)
+        elif keys is not out:
+            np.copyto(out, keys, casting="unsafe")
+        return out
+
+    if dtype.kind == "f":
+        if dtype.itemsize == 8:
+            unsigned = keys.view(np.uint64) ^ SIGN_BIT
+        else:
+            unsigned = keys.astype(np.uint32)
+        return _unsigned_to_float(unsigned, dtype)
+    if dtype == np.uint64:
+        return keys.view(np.uint64) ^ SIGN_BIT
+    return keys.astype(dtype, copy=False)
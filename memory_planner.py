@@ -0,0 +1,164 @@
+import numpy as np
+
+from bucket_sort_numpy import (
+    MAX_COUNT_TABLE,
+    SPARSE_TABLE_RATIO,
+    _magnitude_width,
+    bucket_sort_numpy,
+    count_dtype,
+)
+from external_sort import SPILL_BYTES_PER_KEY, SORT_BYTES_PER_KEY, external_sort
+from key_transform import encode_keys
+from sort_dispatch import ENGINES, choose_engine, prescan
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+KEY_BYTES = 8
+
+# Smallest budget the chunked external path can work in
+MIN_EXTERNAL_BUDGET = 1024**2
+
+# Held by the external path beside its budget: spill file objects and paths,
+# and the NumPy modules it imports on first use (about 1 MB, measured)
+EXTERNAL_OVERHEAD = 1024**2
+
+# Per-bucket bookkeeping: counts, min, max and slot bases for every bucket,
+# spans, widths, batch numbers and the like for the occupied ones; 13 int64
+# arrays measured, 16 leaves headroom
+BUCKET_BYTES = 16 * 8
+
+
+class MemoryBudgetError(MemoryError):
+    """No sort strategy fits in the requested memory budget."""
+
+
+# ---------------------------------------
+# FOOTPRINT MODEL
+# ---------------------------------------
+def _bucket_layout(stats, memory_limit_bytes):
+    # As many equal-width buckets as the bookkeeping budget (1/8 of the
+    # limit) allows, but never more than there are keys or range slots
+    n, R = stats["n"], stats["range"]
+    num_buckets = max(1, min(n, R, memory_limit_bytes // (8 * BUCKET_BYTES)))
+    bucket_size = max(1, -(-R // num_buckets))
+    return bucket_size, -(-R // bucket_size)
+
+
+def estimate_footprint(stats, engine, bucket_size=None):
+    """Predicted peak bytes an in-memory engine allocates, output included.
+
+    "bucket" is bucket_sort_numpy with bucket_size, or without it the
+    dispatcher's magnitude_sort_numpy and its ~sqrt(n) buckets.
+    """
+    n = stats["n"]
+    keys = KEY_BYTES * n
+    # Counters are sized for a single slot holding every key
+    counter = count_dtype(n).itemsize
+    if engine == "counting":
+        k = stats["range"]
+        # table, offsets and output, plus the occupied slots' indices,
+        # values and counts gathered to expand them
+        return counter * k + (16 + counter) * min(k, n) + 2 * keys
+    if engine == "bucket":
+        R = stats["range"]
+        if bucket_size is None:
+            bucket_size = _magnitude_width(R, n)[0]
+        num_buckets = -(-R // bucket_size)
+        # Only buckets narrower than SPARSE_TABLE_RATIO slots per key get a
+        # table, and tables are batched MAX_COUNT_TABLE slots at a time (a
+        # wider bucket on its own)
+        slots = min(R, SPARSE_TABLE_RATIO * n, MAX_COUNT_TABLE + min(bucket_size, SPARSE_TABLE_RATIO * n))
+        # ids, slots, the output, and when dense and sparse buckets mix in
+        # several table batches, both halves with their grouped and sorted
+        # copies: up to 13 key arrays at once measured, 14 leaves headroom
+        return BUCKET_BYTES * num_buckets + counter * slots + 14 * keys
+    if engine == "radix":
+        # keys, permutation, digits and the gathered copy
+        return 3 * keys + 2 * n
+    if engine == "sparse":
+        # np.unique's sorted copy, flags, run starts, distinct values and
+        # counts, and the expanded output
+        return 5 * keys
+    if engine == "comparison":
+        return 2 * keys
+    raise ValueError(f"unknown engine {engine!r}")
+
+
+# ---------------------------------------
+# PLANNER
+# ---------------------------------------
+def plan_sort(array=None, memory_limit_bytes=None, stats=None, output_in_memory=True):
+    """Choose a strategy that stays under memory_limit_bytes before anything is allocated.
+
+    Returns a dict with the chosen 'engine', its 'predicted_bytes', the
+    'candidates' it was picked from, and the sizes to run it with:
+    'bucket_size' / 'num_buckets' for the bucket engine, 'count_dtype' for
+    its counters and 'chunk_size' for the external path. The dispatcher's
+    pick wins when it fits; otherwise the smallest in-memory engine, and the
+    chunked external sort last. Raises MemoryBudgetError when nothing fits.
+    """
+    if memory_limit_bytes is None:
+        raise ValueError("memory_limit_bytes is required")
+    if stats is None:
+        stats = prescan(encode_keys(array)[0])
+    n = stats["n"]
+
+    bucket_size, num_buckets = _bucket_layout(stats, memory_limit_bytes)
+    candidates = {engine: estimate_footprint(stats, engine) for engine in ENGINES}
+    candidates["bucket"] = estimate_footprint(stats, "bucket", bucket_size)
+
+    # The external path holds one chunk (or splitter sample) at a time, plus
+    # the output if the caller wants it back in memory
+    output = KEY_BYTES * n if output_in_memory else 0
+    external_budget = max(
+        MIN_EXTERNAL_BUDGET, min(memory_limit_bytes - output - EXTERNAL_OVERHEAD, SORT_BYTES_PER_KEY * n)
+    )
+    external = external_budget + output + EXTERNAL_OVERHEAD
+
+    preferred = choose_engine(stats=stats)["engine"]
+    fitting = sorted((b, e) for e, b in candidates.items() if b <= memory_limit_bytes)
+    if candidates[preferred] <= memory_limit_bytes:
+        engine, reason = preferred, "dispatcher's choice fits"
+    elif fitting:
+        engine, reason = fitting[0][1], f"dispatcher's choice '{preferred}' needs {candidates[preferred]:,} bytes"
+    elif external <= memory_limit_bytes:
+        engine, reason = "external", "no in-memory engine fits"
+    else:
+        smallest = min(min(candidates.values()), external)
+        raise MemoryBudgetError(
+            f"sorting {n:,} keys needs at least {smallest:,} bytes, "
+            f"budget is {memory_limit_bytes:,} bytes"
+        )
+
+    return {
+        "engine": engine,
+        "reason": reason,
+        "predicted_bytes": external if engine == "external" else candidates[engine],
+        "memory_limit_bytes": memory_limit_bytes,
+        "candidates": dict(candidates, external=external),
+        "bucket_size": bucket_size,
+        "num_buckets": num_buckets,
+        "count_dtype": count_dtype(n),
+        "chunk_size": max(1, external_budget // SPILL_BYTES_PER_KEY),
+        "stats": stats,
+    }
+
+
+def planned_sort(array, memory_limit_bytes, tmp_dir=None, explain=False):
+    """Sort with the strategy plan_sort picks; fails before allocating if nothing fits."""
+    values = np.asarray(array)
+    plan = plan_sort(values, memory_limit_bytes)
+    engine = plan["engine"]
+    if engine == "external":
+        result = external_sort(
+            values, np.empty(len(values), dtype=values.dtype),
+            memory_limit_bytes=plan["chunk_size"] * SPILL_BYTES_PER_KEY, tmp_dir=tmp_dir,
+        )
+    elif engine == "bucket":
+        result = bucket_sort_numpy(values, bucket_size=plan["bucket_size"])
+    else:
+        result = ENGINES[engine](values)
+    if explain:
+        return result, plan
+    return result
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from multiprocessing import get_context
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no ru_maxrss
+    resource = None
+
+from dataset_generator import DEFAULT_CACHE_DIR, DISTRIBUTIONS, load_dataset
+from instrumentation import set_sink
+from key_transform import encode_keys
+from memory_planner import estimate_footprint
+from sort_dispatch import ENGINES, choose_engine, prescan, sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# The dispatcher's engines (whose footprint memory_planner models) and the
+# dispatcher itself, predicted as the engine it picks
+PROFILED_ENGINES = dict(ENGINES, dispatch=sort)
+
+# Cases predicted above this are skipped rather than risk swapping the host
+DEFAULT_MEMORY_LIMIT_MB = 2048
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+DEFAULT_RANGES = [10**6, 10**10]
+DEFAULT_DISTRIBUTIONS = ["uniform", "zipf", "few_distinct"]
+SEED = 42
+
+MB = 1024**2
+
+
+# ---------------------------------------
+# PEAK TRACKING
+# ---------------------------------------
+def maxrss_bytes():
+    """The process's peak resident set size so far, or None where getrusage is missing."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # Linux reports KiB
+
+
+class PeakTracker:
+    """Peak traced allocation of a block and of every instrumentation phase inside it.
+
+        with PeakTracker() as tracker:
+            sort(keys)
+        tracker.peak_bytes, tracker.phases
+
+    tracemalloc sees NumPy's array buffers as well as Python objects. While
+    active the tracker is the instrumentation sink: each phase resets the
+    tracemalloc peak when it opens and reads it when it closes, and open
+    phases fold in the peaks of the phases nested in them. peak_bytes and
+    phases hold bytes above what was allocated when the block / phase began;
+    phases keeps the largest peak per (engine, phase). tracemalloc's peak is
+    process-wide, so phases running on several threads at once share it.
+    """
+
+    def __init__(self):
+        self.peak_bytes = None
+        self.retained_bytes = None
+        self.phases = {}
+        self._open = {}  # thread id -> [[current at start, highest peak since], ...]
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._previous_sink = set_sink(self)
+        self._push()
+        return self
+
+    def __exit__(self, *exc):
+        current = self._fold()
+        start, peak = self._pop()
+        self.peak_bytes = peak - start
+        self.retained_bytes = current - start
+        set_sink(self._previous_sink)
+        if self._started_tracing:
+            tracemalloc.stop()
+        return False
+
+    def _frames(self):
+        return self._open.setdefault(threading.get_ident(), [])
+
+    def _fold(self):
+        # Credit the peak since the last reset to every open frame, then reset
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            for frames in self._open.values():
+                for frame in frames:
+                    frame[1] = max(frame[1], peak)
+            tracemalloc.reset_peak()
+        return current
+
+    def _push(self):
+        current = self._fold()
+        frame = [current, current]
+        self._frames().append(frame)
+        return frame
+
+    def _pop(self):
+        return self._frames().pop()
+
+    def phase_started(self, phase):
+        self._push()
+
+    def __call__(self, event):
+        self._fold()
+        start, peak = self._pop()
+        key = (event["engine"], event["phase"])
+        with self._lock:
+            self.phases[key] = max(self.phases.get(key, 0), peak - start)
+
+
+# ---------------------------------------
+# PROFILING
+# ---------------------------------------
+def _predicted(values, engine):
+    # memory_planner's estimate for the engine that will actually run
+    stats = prescan(encode_keys(values)[0])
+    modelled = choose_engine(stats=stats)["engine"] if engine == "dispatch" else engine
+    return modelled, estimate_footprint(stats, modelled)
+
+
+def profile_sort(array, engine="dispatch"):
+    """Sort array with one of PROFILED_ENGINES and measure what it allocated.
+
+    Returns a dict with predicted_bytes (memory_planner.estimate_footprint of
+    the engine that ran, 'modelled_engine'), peak_bytes (tracemalloc peak
+    above what was allocated before the call, output included),
+    retained_bytes (still held afterwards: the output), ratio (peak over
+    predicted), phases ('engine.phase' -> peak bytes), maxrss_bytes (the
+    process's ru_maxrss afterwards) and seconds (slowed by tracing).
+    """
+    values = np.asarray(array)
+    modelled, predicted = _predicted(values, engine)
+    with PeakTracker() as tracker:
+        start = time.perf_counter()
+        result = PROFILED_ENGINES[engine](values)
+        seconds = time.perf_counter() - start
+    del result
+    return {
+        "engine": engine,
+        "modelled_engine": modelled,
+        "n": len(values),
+        "predicted_bytes": int(predicted),
+        "peak_bytes": tracker.peak_bytes,
+        "retained_bytes": tracker.retained_bytes,
+        "ratio": tracker.peak_bytes / predicted if predicted else None,
+        "phases": {f"{e}.{p}": peak for (e, p), peak in sorted(tracker.phases.items(), key=str)},
+        "maxrss_bytes": maxrss_bytes(),
+        "seconds": seconds,
+    }
+
+
+def _profile_child(dataset, engine):
+    # Runs in a fresh process that loads its own input (unpickling a sent
+    # array would leave a copy-sized high-water mark), so the ru_maxrss
+    # growth belongs to this sort alone, plus tracemalloc's own bookkeeping
+    keys = load_dataset(*dataset)
+    before = maxrss_bytes()
+    record = profile_sort(keys, engine)
+    if before is not None:
+        record["maxrss_growth_bytes"] = record["maxrss_bytes"] - before
+    return record
+
+
+def profile_isolated(distribution, n, value_range, engine="dispatch", seed=SEED, cache_dir=DEFAULT_CACHE_DIR):
+    """profile_sort of a dataset_generator dataset in a freshly spawned
+    process; adds maxrss_growth_bytes, the sort's own growth of ru_maxrss."""
+    dataset = (distribution, n, value_range, seed, cache_dir)
+    with get_context("spawn").Pool(1) as pool:
+        return pool.apply(_profile_child, (dataset, engine))
+
+
+def profile_matrix(engines, distributions, sizes, ranges, seed=SEED, cache_dir=DEFAULT_CACHE_DIR,
+                   isolated=False, memory_limit_bytes=DEFAULT_MEMORY_LIMIT_MB * MB, progress=None):
+    """profile_sort (or profile_isolated) for every engine x n x range x distribution case."""
+    records = []
+    for distribution in distributions:
+        for n in sizes:
+            for value_range in ranges:
+                keys = load_dataset(distribution, n, value_range, seed, cache_dir)
+                for engine in engines:
+                    case = {"distribution": distribution, "range": value_range}
+                    modelled, predicted = _predicted(keys, engine)
+                    if predicted > memory_limit_bytes:
+                        case.update(engine=engine, modelled_engine=modelled, n=n,
+                                    predicted_bytes=int(predicted), skipped=True)
+                    elif isolated:
+                        case.update(profile_isolated(distribution, n, value_range, engine, seed, cache_dir))
+                    else:
+                        case.update(profile_sort(keys, engine))
+                    records.append(case)
+                    if progress is not None:
+                        progress(case)
+    return records
+
+
+# ---------------------------------------
+# COMMAND LINE
+# ---------------------------------------
+def _int(text):
+    try:
+        return int(text.replace("_", ""))
+    except ValueError:
+        return int(float(text))
+
+
+def _print_case(case, phases=False):
+    label = f"{case['engine']:>10} {case['distribution']:>14} n={case['n']:<10,} range={case['range']:<16,}"
+    predicted = f"predicted {case['predicted_bytes'] / MB:9.1f} MB"
+    if case.get("skipped"):
+        print(f"{label} {predicted}  skipped")
+        return
+    line = f"{label} {predicted}  peak {case['peak_bytes'] / MB:9.1f} MB  ({case['ratio']:.2f}x)"
+    if "maxrss_growth_bytes" in case:
+        line += f"  rss +{case['maxrss_growth_bytes'] / MB:.1f} MB"
+    print(line)
+    if phases:
+        for name, peak in case["phases"].items():
+            print(f"{'':>12}{name:<40} {peak / MB:9.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the peak memory of the sort engines against memory_planner's predictions.")
+    parser.add_argument("--engines", nargs="+", default=list(PROFILED_ENGINES), choices=list(PROFILED_ENGINES))
+    parser.add_argument("--distributions", nargs="+", default=DEFAULT_DISTRIBUTIONS, choices=sorted(DISTRIBUTIONS))
+    parser.add_argument("--sizes", nargs="+", type=_int, default=DEFAULT_SIZES)
+    parser.add_argument("--ranges", nargs="+", type=_int, default=DEFAULT_RANGES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--isolated", action="store_true",
+                        help="run every case in a fresh process so ru_maxrss growth is its own")
+    parser.add_argument("--memory-limit-mb", type=float, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="skip cases predicted above this (default: %(default)s)")
+    parser.add_argument("--phases", action="store_true", help="print the peak of every phase")
+    parser.add_argument("--output", help="write the records as JSON here")
+    args = parser.parse_args(argv)
+
+    records = profile_matrix(
+        args.engines, args.distributions, args.sizes, args.ranges, args.seed, args.cache_dir,
+        args.isolated, int(args.memory_limit_mb * MB), progress=lambda case: _print_case(case, args.phases),
+    )
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"maxrss_bytes": maxrss_bytes(), "results": records}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
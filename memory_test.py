@@ -196,7 +196,8 @@ class MemoryGuard:
                     os.kill(os.getpid(), signal.SIGTERM)
                     return
                     
-            except:
+            except psutil.Error:
+                # The sample failed (e.g. access denied); try again next tick
                 pass
             
             time.sleep(self.check_interval)
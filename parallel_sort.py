@@ -0,0 +1,151 @@
+import numpy as np
+from multiprocessing import Pool, cpu_count, resource_tracker, shared_memory
+
+from bucket_sort_numpy import _key_out, _sample_splitters
+from instrumentation import bucket_stats, instrumented, phase
+from key_transform import decode_keys, encode_keys
+from range_partition import (
+    PARTITIONS_PER_WORKER,
+    SAMPLE_SIZE,
+    _histogram_chunk,
+    _range_offsets,
+    _scatter_chunk,
+    _sort_range,
+)
+from sort_dispatch import sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Below this many keys spawning workers costs more than it saves
+PARALLEL_THRESHOLD = 1_000_000
+
+
+# ---------------------------------------
+# SHARED MEMORY
+# ---------------------------------------
+def _create_block(n):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n * 8))
+    return shm, np.ndarray(n, dtype=np.int64, buffer=shm.buf)
+
+
+def _attach(name):
+    # The parent owns and unlinks every block; from Python 3.13 workers can
+    # attach without registering it with a resource tracker at all
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _attached(names, n, work, *args):
+    # work(*blocks, *args) on the named blocks as int64 arrays, detaching them
+    # before returning: nothing stays mapped in a worker between tasks, so a
+    # pool reused across calls holds no memory once the parent unlinks the
+    # blocks, the only cleanup they need.
+    blocks = [_attach(name) for name in names]
+    try:
+        return work(*[np.ndarray(n, dtype=np.int64, buffer=shm.buf) for shm in blocks], *args)
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+# ---------------------------------------
+# POOL TASKS
+# ---------------------------------------
+# range_partition's phases on the shared input / output blocks
+def _histogram_task(args):
+    names, n, start, stop, splitters = args
+    return _attached(names[:1], n, _histogram_chunk, start, stop, splitters)
+
+
+def _scatter_task(args):
+    names, n, start, stop, splitters, offsets = args
+    _attached(names, n, _scatter_chunk, start, stop, splitters, offsets)
+
+
+def _sort_range_task(args):
+    names, n, start, stop = args
+    _attached(names[1:], n, _sort_range, start, stop)
+
+
+# ---------------------------------------
+# PARALLEL SORT
+# ---------------------------------------
+@instrumented("parallel")
+def parallel_sort(array, workers=None, pool=None, out=None, workspace=None):
+    """Sort with several processes sharing the input and output buffers.
+
+    The key range is cut into ranges of similar population; workers count and
+    scatter their input chunks straight into each range's output slice, then
+    sort the ranges independently. Keys are never pickled. Pass an existing
+    Pool, with its number of processes as workers, to skip spawning workers
+    on every call. Before Python 3.13, call
+    multiprocessing.resource_tracker.ensure_running() before creating that
+    Pool, as parallel_sort does before its own, or its workers report the
+    shared blocks as leaked when they exit.
+
+    out and workspace are as for counting_sort_numpy. The result is copied
+    from shared memory straight into out; workspace only serves inputs
+    sorted on the calling process, below PARALLEL_THRESHOLD.
+    """
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if workers is None:
+        if pool is not None:
+            raise ValueError("pass workers= along with pool=, the number of processes in the pool")
+        workers = cpu_count()
+    if n < PARALLEL_THRESHOLD or workers < 2:
+        keys = _key_out(out, n, dtype, workspace)
+        return decode_keys(sort(values, out=keys, workspace=workspace), dtype, out)
+
+    # Started before any pool or block so that the pool's workers inherit it:
+    # their block registrations then land in the tracker the parent's unlink
+    # clears, instead of a per-worker tracker that "cleans up" the already
+    # unlinked blocks again when the worker exits.
+    resource_tracker.ensure_running()
+    src_shm, src = _create_block(n)
+    dst_shm, dst = _create_block(n)
+    own_pool = pool is None
+    try:
+        src[:] = values
+        with phase("sample_splitters"):
+            splitters = _sample_splitters(values, workers * PARTITIONS_PER_WORKER, SAMPLE_SIZE)
+        bounds = np.linspace(0, n, workers + 1).astype(np.int64)
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+
+        if own_pool:
+            pool = Pool(workers)
+        names = (src_shm.name, dst_shm.name)
+
+        with phase("histogram", workers=workers) as p:
+            histograms = np.array(
+                pool.map(_histogram_task, [(names, n, a, b, splitters) for a, b in chunks])
+            )
+            sizes, starts, chunk_offsets = _range_offsets(histograms)
+            if p:
+                p.record(**bucket_stats(sizes))
+
+        with phase("scatter"):
+            pool.map(
+                _scatter_task,
+                [
+                    (names, n, a, b, splitters, offsets)
+                    for (a, b), offsets in zip(chunks, chunk_offsets)
+                ],
+            )
+        ranges = [(names, n, s, s + c) for s, c in zip(starts, sizes) if c]
+        with phase("sort_ranges", ranges=len(ranges)):
+            for _ in pool.imap_unordered(_sort_range_task, ranges):
+                pass
+
+        return decode_keys(dst.copy() if out is None else dst, dtype, out)
+    finally:
+        if own_pool and pool is not None:
+            pool.close()
+            pool.join()
+        del src, dst
+        for shm in (src_shm, dst_shm):
+            shm.close()
+            shm.unlink()
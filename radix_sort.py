@@ -0,0 +1,87 @@
+import numpy as np
+
+from bucket_sort_numpy import _as_int64, _trivial
+from instrumentation import instrumented, phase
+from key_transform import decode_keys, encode_keys
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+DIGIT_DTYPES = {8: np.uint8, 16: np.uint16}
+
+SIGN_BIT = np.uint64(1 << 63)
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _to_radix_keys(values):
+    # Flipping the sign bit maps int64 order onto uint64 order
+    return values.view(np.uint64) ^ SIGN_BIT
+
+
+def _from_radix_keys(keys):
+    return (keys ^ SIGN_BIT).view(np.int64)
+
+
+def _active_passes(keys, digit_bits):
+    # A digit that is identical across the input cannot change the order,
+    # so only passes covering at least one varying bit are run.
+    varying = int(np.bitwise_or.reduce(keys ^ keys[0]))
+    mask = (1 << digit_bits) - 1
+    return [shift for shift in range(0, 64, digit_bits) if (varying >> shift) & mask]
+
+
+def _digit_order(keys, shift, digit_bits):
+    # One LSD pass: the stable permutation that groups keys by this digit.
+    # NumPy's stable sort on uint8/uint16 is a counting sort (histogram,
+    # prefix-sum offsets, scatter) running in C, so the pass stays O(n + 2^bits).
+    mask = np.uint64((1 << digit_bits) - 1)
+    digits = ((keys >> np.uint64(shift)) & mask).astype(DIGIT_DTYPES[digit_bits])
+    return np.argsort(digits, kind="stable")
+
+
+def _radix_order(keys, digit_bits):
+    order = np.arange(len(keys))
+    for shift in _active_passes(keys, digit_bits):
+        order = order[_digit_order(keys[order], shift, digit_bits)]
+    return order
+
+
+def _check_digit_bits(digit_bits):
+    if digit_bits not in DIGIT_DTYPES:
+        raise ValueError(f"digit_bits must be one of {sorted(DIGIT_DTYPES)}, got {digit_bits}")
+
+
+# ---------------------------------------
+# RADIX SORT
+# ---------------------------------------
+@instrumented("radix")
+def radix_sort(array, digit_bits=8, out=None, workspace=None):
+    """LSD radix sort over the full 64-bit key; memory is O(n + 2^digit_bits).
+
+    out is as for counting_sort_numpy; the passes keep no count tables, so
+    workspace is accepted only to match the other engines.
+    """
+    _check_digit_bits(digit_bits)
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+
+    keys = _to_radix_keys(values)
+    with phase("find_passes") as p:
+        passes = _active_passes(keys, digit_bits)
+        p.record(passes=len(passes))
+    for shift in passes:
+        with phase("digit_pass", elements=len(keys), shift=shift):
+            keys = keys[_digit_order(keys, shift, digit_bits)]
+    return decode_keys(_from_radix_keys(keys), dtype, out)
+
+
+def radix_argsort(array, digit_bits=8):
+    """Stable permutation that sorts the input, one LSD pass per varying digit."""
+    _check_digit_bits(digit_bits)
+    values = _as_int64(array)
+    if len(values) <= 1:
+        return np.arange(len(values))
+    return _radix_order(_to_radix_keys(values), digit_bits)
@@ -0,0 +1,48 @@
+import numpy as np
+
+from bucket_sort_numpy import _ranges
+from sort_dispatch import sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# More key ranges than workers so a slow range does not idle the pool
+PARTITIONS_PER_WORKER = 4
+
+SAMPLE_SIZE = 4096
+
+
+# ---------------------------------------
+# WORKER PHASES
+# ---------------------------------------
+# The three phases parallel_sort runs in processes and threaded_sort in
+# threads. Every phase is a handful of NumPy calls on a contiguous slice
+# (searchsorted, argsort, take, sort), which drop the GIL while they run, so
+# threads genuinely run side by side. Workers only ever write their own slots.
+def _histogram_chunk(values, start, stop, splitters):
+    # Phase 1: how many keys of this input chunk fall in each key range
+    parts = np.searchsorted(splitters, values[start:stop], side="right")
+    return np.bincount(parts, minlength=len(splitters) + 1)
+
+
+def _scatter_chunk(values, out, start, stop, splitters, offsets):
+    # Phase 2: copy this chunk's keys into their ranges' slices of the output,
+    # at offsets precomputed so no two chunks write the same slot
+    chunk = values[start:stop]
+    parts = np.searchsorted(splitters, chunk, side="right")
+    order = np.argsort(parts.astype(np.uint16), kind="stable")
+    counts = np.bincount(parts, minlength=len(splitters) + 1)
+    out[_ranges(offsets, counts)] = chunk[order]
+
+
+def _sort_range(out, start, stop):
+    # Phase 3: sort one key range inside its output slice
+    out[start:stop] = sort(out[start:stop])
+
+
+def _range_offsets(histograms):
+    # Per-chunk histograms -> each range's size and output start, and where
+    # every chunk's keys of every range go
+    sizes = histograms.sum(axis=0)
+    starts = np.cumsum(sizes) - sizes
+    return sizes, starts, starts + np.cumsum(histograms, axis=0) - histograms
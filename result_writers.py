@@ -0,0 +1,181 @@
+import itertools
+import os
+
+import numpy as np
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Values per write for the binary writers (8 MiB of int64) ...
+BINARY_CHUNK = 1 << 20
+# ... and per formatted string for the text writers
+TEXT_CHUNK = 1 << 16
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _chunks(result, chunk_size):
+    # The sorted output as a sequence of ndarrays: views into an array, a
+    # RunLengthArray's expanded windows, or the chunks of any iterable
+    # (StreamingCountingSort.finish(), streaming_sort(), ...)
+    if isinstance(result, np.ndarray):
+        flat = result.reshape(-1)
+        for a in range(0, len(flat), chunk_size):
+            yield flat[a:a + chunk_size]
+    elif hasattr(result, "iter_chunks"):
+        yield from result.iter_chunks(chunk_size)
+    else:
+        for chunk in result:
+            yield np.asarray(chunk)
+
+
+def _little_endian(chunk):
+    return chunk.astype(chunk.dtype.newbyteorder("<"), copy=False)
+
+
+def _sized(result):
+    # Length and dtype when known up front, None for a plain chunk iterable
+    if isinstance(result, np.ndarray):
+        return result.size, result.dtype
+    if hasattr(result, "iter_chunks"):
+        return len(result), result.dtype
+    return None
+
+
+def _write_npy_chunks(result, path, chunk_size):
+    # A chunk iterable's length is only known once it is exhausted: write the
+    # header of an empty array, append the chunks, then rewrite the header
+    # with the final length. NumPy pads the header with room for any length,
+    # so the rewrite never moves the data.
+    chunks = _chunks(result, chunk_size)
+    first = next(chunks, None)
+    dtype = np.dtype(np.int64 if first is None else first.dtype).newbyteorder("<")
+    header = np.lib.format.header_data_from_array_1_0(np.zeros(0, dtype=dtype))
+    with open(path, "wb") as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        data_start = f.tell()
+        n = 0
+        if first is not None:
+            for chunk in itertools.chain([first], chunks):
+                chunk.astype(dtype, copy=False).tofile(f)
+                n += len(chunk)
+        f.seek(0)
+        header["shape"] = (n,)
+        np.lib.format.write_array_header_1_0(f, header)
+        if f.tell() != data_start:
+            raise RuntimeError(f"the .npy header of {path!r} changed size when its length was filled in")
+    return path
+
+
+def _write_delimited(result, path, sep, end, chunk_size):
+    with open(path, "w", newline="") as f:
+        first = True
+        for chunk in _chunks(result, chunk_size):
+            if len(chunk) == 0:
+                continue
+            if not first:
+                f.write(sep)
+            f.write(sep.join(map(str, chunk.tolist())))
+            first = False
+        f.write(end)
+    return path
+
+
+# ---------------------------------------
+# WRITERS
+# ---------------------------------------
+def memmap_output(path, n, dtype=np.int64):
+    """Preallocated file-backed output to pass as out= to a sort: zero-copy writes.
+
+    A .npy path gets a header; anything else is raw little-endian.
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if str(path).endswith(".npy"):
+        return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n,))
+    if n == 0:
+        open(path, "wb").close()
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="w+", shape=(n,))
+
+
+def write_binary(result, path, chunk_size=BINARY_CHUNK):
+    """Raw little-endian values with no header; load with np.fromfile or np.memmap."""
+    with open(path, "wb") as f:
+        for chunk in _chunks(result, chunk_size):
+            _little_endian(chunk).tofile(f)
+    return path
+
+
+def write_npy(result, path, chunk_size=BINARY_CHUNK):
+    """.npy file (header + little-endian values); np.load(path, mmap_mode="r") maps it back.
+
+    A chunk iterable is appended chunk by chunk and its length filled into
+    the header at the end.
+    """
+    if isinstance(result, np.ndarray):
+        with open(path, "wb") as f:
+            np.lib.format.write_array(f, _little_endian(result.reshape(-1)), allow_pickle=False)
+        return path
+    if _sized(result) is None:
+        return _write_npy_chunks(result, path, chunk_size)
+    return write_memmap(result, path, chunk_size)
+
+
+def write_memmap(result, path, chunk_size=BINARY_CHUNK):
+    """Fill a memory-mapped file chunk by chunk (.npy header if the path asks for one).
+
+    A chunk iterable has no length to map up front; it is appended instead,
+    as write_npy and write_binary do.
+    """
+    sized = _sized(result)
+    if sized is None:
+        if str(path).endswith(".npy"):
+            return _write_npy_chunks(result, path, chunk_size)
+        return write_binary(result, path, chunk_size)
+    n, dtype = sized
+    out = memmap_output(path, n, dtype)
+    start = 0
+    for chunk in _chunks(result, chunk_size):
+        out[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    if isinstance(out, np.memmap):
+        out.flush()
+    del out
+    return path
+
+
+def write_csv(result, path, chunk_size=TEXT_CHUNK):
+    """One comma-separated row, byte for byte what csv.writer().writerow() writes,
+    but formatted chunk_size values at a time."""
+    return _write_delimited(result, path, ",", "\r\n", chunk_size)
+
+
+def write_text(result, path, chunk_size=TEXT_CHUNK):
+    """One value per line."""
+    return _write_delimited(result, path, "\n", "\n", chunk_size)
+
+
+WRITERS = {
+    "binary": write_binary,
+    "npy": write_npy,
+    "memmap": write_memmap,
+    "csv": write_csv,
+    "text": write_text,
+}
+
+EXTENSIONS = {".bin": "binary", ".raw": "binary", ".npy": "npy", ".csv": "csv", ".txt": "text"}
+
+# File extension each format writes by default
+FORMAT_EXTENSIONS = {"binary": ".bin", "npy": ".npy", "memmap": ".npy", "csv": ".csv", "text": ".txt"}
+
+
+def write_result(result, path, fmt=None, **kwargs):
+    """Write a sorted result with the writer for fmt (one of WRITERS), or the path's extension."""
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+        if fmt is None:
+            raise ValueError(f"cannot tell the format of {path!r}; pass fmt= one of {sorted(WRITERS)}")
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown format {fmt!r}; expected one of {sorted(WRITERS)}")
+    return WRITERS[fmt](result, path, **kwargs)
@@ -0,0 +1,134 @@
+import numpy as np
+
+from bucket_sort_numpy import MAX_COUNT_TABLE, SPARSE_TABLE_RATIO, _count_slots, _span
+from key_transform import decode_keys, encode_keys
+from sparse_counting import _repeat, _sparse_counts
+from streaming_sort import _expand_windows
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Keys expanded at a time while iterating
+ITER_CHUNK = 1 << 16
+
+
+# ---------------------------------------
+# RUN-LENGTH ENCODED RESULT
+# ---------------------------------------
+class RunLengthArray:
+    """Sorted keys stored as (distinct value, count) runs, expanded only on demand.
+
+    Behaves like the sorted 1-D array for len(), indexing, slicing and
+    iteration; np.asarray() or to_numpy() materializes it. unique() and
+    counts() hand back the runs themselves without any expansion.
+    """
+
+    def __init__(self, keys, counts, dtype):
+        # keys: sorted distinct int64 keys as produced by encode_keys
+        self._keys = keys
+        self._counts = np.asarray(counts, dtype=np.int64)
+        self._ends = np.cumsum(self._counts)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_sorted(cls, array):
+        """Encode an already sorted array."""
+        values, dtype = encode_keys(array)
+        if len(values) == 0:
+            return cls(values[:0].copy(), [], dtype)
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+        return cls(values[starts], np.diff(np.append(starts, len(values))), dtype)
+
+    def __len__(self):
+        return int(self._ends[-1]) if len(self._ends) else 0
+
+    @property
+    def runs(self):
+        return len(self._counts)
+
+    @property
+    def nbytes(self):
+        return self._keys.nbytes + self._counts.nbytes + self._ends.nbytes
+
+    def unique(self):
+        """Sorted distinct keys."""
+        return decode_keys(self._keys, self.dtype)
+
+    def counts(self):
+        """How often each of unique() occurs."""
+        return self._counts.copy()
+
+    def _runs_of(self, positions):
+        return np.searchsorted(self._ends, positions, side="right")
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            return self._slice(start, max(start, stop))
+
+        positions = np.asarray(index)
+        if positions.dtype.kind not in "iu":
+            raise TypeError(f"RunLengthArray indices must be integers or slices, not {positions.dtype}")
+        if ((positions < -n) | (positions >= n)).any():
+            raise IndexError(f"index out of range for {n} keys")
+        positions = np.where(positions < 0, positions + n, positions)
+        keys = self._keys[self._runs_of(positions.ravel())]
+        values = decode_keys(keys, self.dtype).reshape(positions.shape)
+        return values[()] if positions.ndim == 0 else values
+
+    def _slice(self, start, stop):
+        if start == stop:
+            return RunLengthArray(self._keys[:0], [], self.dtype)
+        first, last = self._runs_of([start, stop - 1])
+        counts = self._counts[first:last + 1].copy()
+        counts[0] = min(int(self._ends[first]), stop) - start
+        if last > first:
+            counts[-1] = stop - int(self._ends[last] - self._counts[last])
+        return RunLengthArray(self._keys[first:last + 1], counts, self.dtype)
+
+    def iter_chunks(self, chunk_size=ITER_CHUNK):
+        """Expanded keys, at most chunk_size at a time."""
+        for block in _expand_windows(self._keys, self._counts, chunk_size):
+            yield decode_keys(block, self.dtype)
+
+    def __iter__(self):
+        for block in self.iter_chunks():
+            yield from block
+
+    def to_numpy(self, out=None):
+        """Expand into a sorted ndarray, or into out if given."""
+        if out is None:
+            return decode_keys(_repeat(self._keys, self._counts), self.dtype)
+        if self.dtype == np.int64:
+            return decode_keys(_repeat(self._keys, self._counts, out), self.dtype, out)
+        return decode_keys(_repeat(self._keys, self._counts), self.dtype, out)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.to_numpy()
+        return array if dtype is None else array.astype(dtype)
+
+    def __repr__(self):
+        return f"RunLengthArray(n={len(self):,}, runs={self.runs:,}, dtype={self.dtype})"
+
+
+def run_length_sort(array):
+    """Sort into a RunLengthArray; the n-length output is never built.
+
+    Narrow ranges are counted over a table spanning [min, max]; wider ones
+    count only the values present.
+    """
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if n == 0:
+        return RunLengthArray(values[:0].copy(), [], dtype)
+
+    R = _span(values)
+    if R <= min(MAX_COUNT_TABLE, SPARSE_TABLE_RATIO * n):
+        lo = values.min()
+        table = _count_slots(values - lo, R, n)
+        occupied = np.flatnonzero(table)
+        return RunLengthArray(occupied + lo, table[occupied], dtype)
+    return RunLengthArray(*_sparse_counts(values), dtype)
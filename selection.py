@@ -0,0 +1,162 @@
+import numpy as np
+
+from bucket_sort_numpy import _magnitude_width, _offsets, _span
+from key_transform import decode_keys, encode_keys
+from sort_dispatch import sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Keys handled per step of the histogram and gather passes, so no
+# n-length bucket id array is ever built
+BLOCK = 1 << 16
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _blocks(values):
+    for a in range(0, len(values), BLOCK):
+        yield values[a:a + BLOCK]
+
+
+class _Histogram:
+    # ~sqrt(n) equal-width buckets over [min, max], as magnitude_sort_numpy
+    # uses, and how many keys fall in each
+    def __init__(self, values):
+        self.lo = values.min()
+        bucket_size, num_buckets = _magnitude_width(_span(values), len(values))
+        self.bucket_size = np.uint64(bucket_size)
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+        for block in _blocks(values):
+            self.counts += np.bincount(self.ids(block), minlength=num_buckets)
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def ids(self, block):
+        return (_offsets(block, self.lo) // self.bucket_size).astype(np.intp)
+
+    def bucket_of(self, ranks):
+        return np.searchsorted(self.starts, ranks, side="right") - 1
+
+    def gather(self, values, wanted):
+        # Keys of the buckets flagged in wanted, in input order
+        return np.concatenate([block[wanted[self.ids(block)]] for block in _blocks(values)])
+
+
+def _select_ranks(values, ranks):
+    # Keys of the given 0-based ranks, finishing only inside their buckets.
+    # Buckets are ordered by value, so the gathered keys sorted would be the
+    # target buckets' slices of the sorted input laid end to end.
+    hist = _Histogram(values)
+    targets = np.unique(hist.bucket_of(ranks))
+    wanted = np.zeros(len(hist.counts), dtype=bool)
+    wanted[targets] = True
+    gathered = hist.gather(values, wanted)
+
+    kept_before = np.cumsum(hist.counts[targets]) - hist.counts[targets]
+    buckets = hist.bucket_of(ranks)
+    local = ranks - hist.starts[buckets] + kept_before[np.searchsorted(targets, buckets)]
+    return np.partition(gathered, np.unique(local))[local]
+
+
+def _smallest(values, k):
+    # The k smallest keys, sorted: every bucket below the k-th key's bucket
+    # is taken whole, and only that bucket is partitioned.
+    hist = _Histogram(values)
+    bucket = hist.bucket_of(k - 1)
+    gathered = hist.gather(values, np.arange(len(hist.counts)) <= bucket)
+    return sort(np.partition(gathered, k - 1)[:k])
+
+
+def _check_rank(k, n):
+    if not -n <= k < n:
+        raise IndexError(f"rank {k} is out of range for {n} keys")
+    return k + n if k < 0 else k
+
+
+# ---------------------------------------
+# SELECTION
+# ---------------------------------------
+def select(array, k):
+    """The k-th smallest key (0-based; negative k counts from the largest).
+
+    Same result as sort(array)[k], in O(n) time: a coarse histogram locates
+    the bucket holding rank k and only that bucket is partitioned.
+    """
+    values, dtype = encode_keys(array)
+    k = _check_rank(int(k), len(values))
+    return decode_keys(_select_ranks(values, np.array([k])), dtype)[0]
+
+
+def topk(array, k, largest=False):
+    """The k smallest keys in ascending order, or the k largest in descending order."""
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if not 0 <= k <= n:
+        raise ValueError(f"k must be between 0 and {n}, got {k}")
+    if k == 0:
+        return decode_keys(values[:0].copy(), dtype)
+    if largest:
+        # Largest keys are the smallest of the keys negated bit for bit
+        return decode_keys(~_smallest(~values, k), dtype)
+    return decode_keys(_smallest(values, k), dtype)
+
+
+def _lerp(low, high, t):
+    # np.percentile's interpolation: from the nearer end, so t = 1 gives high
+    # exactly, computed in the dtypes np.percentile computes in
+    diff = high - low
+    result = np.asarray(low + diff * t)
+    np.subtract(high, diff * (1 - t), out=result, where=np.asarray(t >= 0.5), casting="unsafe")
+    return result
+
+
+def percentiles(array, qs):
+    """Exact percentiles, equal to np.percentile's default linear method.
+
+    qs is a scalar or a sequence of percentages in [0, 100]; every rank they
+    need is found in one histogram and one gather pass. The result has
+    np.percentile's dtype too: a float input with a Python scalar q keeps its
+    precision, anything else comes back as float64. Any NaN makes every
+    percentile NaN.
+    """
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if n == 0:
+        raise ValueError("percentiles of an empty array")
+    weak = type(qs) in (int, float)
+    qs = np.asarray(qs, dtype=np.float64)
+    if ((qs < 0) | (qs > 100)).any():
+        raise ValueError("percentiles must be between 0 and 100")
+
+    position = (n - 1) * (qs.ravel() / 100)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, n - 1)
+    t = position - below
+    # The largest key rides along: NaNs sort last
+    ranks = np.concatenate((below, above, [n - 1]))
+    keys = decode_keys(_select_ranks(values, ranks), dtype)
+
+    m = len(below)
+    low, high = keys[:m], keys[m:2 * m]
+    if weak:
+        # A Python scalar q does not widen float32 keys to float64
+        result = _lerp(low[0], high[0], float(t[0]))
+    else:
+        result = _lerp(low, high, t).reshape(qs.shape)
+    if dtype.kind == "f" and np.isnan(keys[-1]):
+        result = np.full_like(result, np.nan)
+    return result[()] if np.ndim(result) == 0 else result
+
+
+def median(array):
+    """Exact median, equal to np.median: the mean of the middle key or two."""
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if n == 0:
+        raise ValueError("median of an empty array")
+    ranks = np.array([(n - 1) // 2, n // 2, n - 1])
+    keys = decode_keys(_select_ranks(values, ranks), dtype)
+    if dtype.kind == "f" and np.isnan(keys[-1]):
+        return keys[-1]
+    return np.mean(keys[:1] if n % 2 else keys[:2])
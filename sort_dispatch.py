@@ -0,0 +1,237 @@
+import numpy as np
+
+from bucket_sort_numpy import (
+    _as_int64,
+    _key_out,
+    _magnitude_width,
+    _offsets,
+    _trivial,
+    bucket_argsort,
+    counting_argsort,
+    counting_sort_numpy,
+    magnitude_sort_numpy,
+    sparse_argsort,
+)
+from instrumentation import instrumented, phase
+from key_transform import decode_keys, encode_keys
+from radix_sort import radix_argsort, radix_sort
+from sparse_counting import sparse_counting_sort
+from tuning import thresholds_for
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Below this many elements the fixed cost of building tables dominates
+SMALL_INPUT = 2048
+
+# Counting tables pay off while the slots they scan stay a fraction of n:
+# the whole range for counting, the occupied buckets' slots for bucket
+DENSE_RANGE_RATIO = 0.125
+BUCKET_SLOT_RATIO = 0.125
+
+# Radix is used for wide ranges that need at most this many 16-bit passes.
+# 0 keeps it off: on the machines measured so far np.sort's SIMD kernels beat
+# even a single NumPy-level LSD pass. calibrate.py raises it on hosts where
+# that does not hold.
+RADIX_MAX_PASSES = 0
+RADIX_DIGIT_BITS = 16
+
+# Sparse counting is used for wide ranges holding at most this many distinct
+# values per element. 0 keeps it off: its np.unique sorts the whole input, so
+# it only wins where counting the duplicates costs less than np.sort's pass.
+SPARSE_CARDINALITY_RATIO = 0.0
+
+# Elements looked at to estimate cardinality and bucket occupancy
+SAMPLE_SIZE = 1024
+
+# The cutoffs above are defaults; the host's calibrated values (calibrate.py)
+# replace them at first use
+TUNED_CONSTANTS = (
+    "SMALL_INPUT",
+    "DENSE_RANGE_RATIO",
+    "BUCKET_SLOT_RATIO",
+    "SPARSE_CARDINALITY_RATIO",
+    "RADIX_MAX_PASSES",
+)
+_tuned = False
+
+
+# ---------------------------------------
+# TUNING
+# ---------------------------------------
+def _load_tuning():
+    global _tuned
+    calibrated = thresholds_for("sort_dispatch")
+    globals().update({name: calibrated[name] for name in TUNED_CONSTANTS if name in calibrated})
+    _tuned = True
+
+
+# ---------------------------------------
+# ENGINES
+# ---------------------------------------
+@instrumented("comparison")
+def comparison_sort(array, out=None, workspace=None):
+    """np.sort on the int64 keys; the fallback when no table-based engine fits.
+
+    out is as for counting_sort_numpy; an int64 out is sorted in place, with
+    no copy at all. workspace is accepted only to match the other engines.
+    """
+    values, dtype = encode_keys(array)
+    if len(values) <= 1:
+        return _trivial(values, dtype, out)
+    keys = _key_out(out, len(values), dtype, workspace)
+    if keys is None:
+        return decode_keys(np.sort(values), dtype, out)
+    np.copyto(keys, values)
+    keys.sort()
+    return decode_keys(keys, dtype, out)
+
+
+def comparison_argsort(array):
+    return np.argsort(_as_int64(array), kind="stable")
+
+
+ENGINES = {
+    "counting": counting_sort_numpy,
+    "bucket": magnitude_sort_numpy,
+    "radix": lambda array, **kwargs: radix_sort(array, digit_bits=RADIX_DIGIT_BITS, **kwargs),
+    "sparse": sparse_counting_sort,
+    "comparison": comparison_sort,
+}
+
+ARGSORT_ENGINES = {
+    "counting": counting_argsort,
+    "bucket": bucket_argsort,
+    "radix": lambda array: radix_argsort(array, digit_bits=RADIX_DIGIT_BITS),
+    "sparse": sparse_argsort,
+    "comparison": comparison_argsort,
+}
+
+
+# ---------------------------------------
+# PRE-SCAN
+# ---------------------------------------
+def _estimate_distinct(sample_distinct, sample_size, population):
+    # A sample that already repeats itself has seen (almost) every distinct
+    # value; otherwise assume the sample's distinct ratio holds for the rest.
+    if sample_distinct * 2 <= sample_size:
+        return sample_distinct
+    return min(population, sample_distinct * population // sample_size)
+
+
+def prescan(array):
+    """Cheap statistics the dispatcher decides on: n, min, max, range and estimates."""
+    values = _as_int64(array)
+    n = len(values)
+    stats = {"n": n, "min": 0, "max": 0, "range": 0, "cardinality": n, "bucket_slots": 0, "radix_passes": 0}
+    if n == 0:
+        return stats
+
+    lo = int(values.min())
+    hi = int(values.max())
+    R = hi - lo + 1
+    sample = values[:: max(1, n // SAMPLE_SIZE)]
+    m = len(sample)
+
+    # Same buckets as magnitude_sort_numpy, offsets in uint64 like the engines
+    bucket_size, num_buckets = _magnitude_width(R, n)
+    ids = _offsets(sample, values.min()) // np.uint64(bucket_size)
+    occupied = _estimate_distinct(len(np.unique(ids)), m, min(n, num_buckets))
+
+    stats.update(
+        min=lo,
+        max=hi,
+        range=R,
+        cardinality=_estimate_distinct(len(np.unique(sample)), m, min(n, R)),
+        bucket_slots=occupied * bucket_size,
+        radix_passes=-(-(R - 1).bit_length() // RADIX_DIGIT_BITS),
+    )
+    return stats
+
+
+# ---------------------------------------
+# DISPATCH
+# ---------------------------------------
+def choose_engine(array=None, stats=None):
+    """Pick the cheapest engine for the input; returns the stats plus 'engine' and 'reason'."""
+    if not _tuned:
+        _load_tuning()
+    if stats is None:
+        stats = prescan(array)
+    n = stats["n"]
+
+    if n < SMALL_INPUT:
+        engine = "comparison"
+        reason = f"n={n:,} is below SMALL_INPUT={SMALL_INPUT:,}"
+    elif stats["range"] <= DENSE_RANGE_RATIO * n:
+        engine = "counting"
+        reason = f"range {stats['range']:,} <= {DENSE_RANGE_RATIO} * n"
+    elif stats["bucket_slots"] <= BUCKET_SLOT_RATIO * n:
+        engine = "bucket"
+        reason = f"~{stats['bucket_slots']:,} occupied bucket slots <= {BUCKET_SLOT_RATIO} * n"
+    elif stats["cardinality"] <= SPARSE_CARDINALITY_RATIO * n:
+        engine = "sparse"
+        reason = f"~{stats['cardinality']:,} distinct values <= {SPARSE_CARDINALITY_RATIO} * n"
+    elif stats["radix_passes"] <= RADIX_MAX_PASSES:
+        engine = "radix"
+        reason = f"{stats['radix_passes']} radix passes <= RADIX_MAX_PASSES={RADIX_MAX_PASSES}"
+    else:
+        engine = "comparison"
+        reason = (
+            f"range {stats['range']:,} and ~{stats['bucket_slots']:,} bucket slots "
+            f"are too wide for counting tables at n={n:,}"
+        )
+
+    return dict(stats, engine=engine, reason=reason)
+
+
+def _choose(values, engine):
+    if engine is None:
+        return choose_engine(values)
+    return dict(prescan(values), engine=engine, reason="forced by caller")
+
+
+@instrumented("dispatch")
+def sort(array, explain=False, engine=None, nan_position="last", out=None, workspace=None):
+    """Sort integer or float keys with whichever engine fits the input best.
+
+    engine forces one of ENGINES instead of dispatching. nan_position puts
+    float NaNs "first" or "last". out and workspace are passed through as
+    for counting_sort_numpy. With explain=True, returns (sorted_array,
+    choice) where choice is the dict produced by choose_engine.
+    """
+    values, dtype = encode_keys(array, nan_position)
+    with phase("choose_engine") as p:
+        choice = _choose(values, engine)
+        p.record(chosen=choice["engine"])
+    keys = _key_out(out, len(values), dtype, workspace)
+    result = ENGINES[choice["engine"]](values, out=keys, workspace=workspace)
+    result = decode_keys(result, dtype, out)
+    if explain:
+        return result, choice
+    return result
+
+
+def argsort(array, explain=False, engine=None, nan_position="last"):
+    """Stable permutation that sorts the input; same dispatch as sort()."""
+    values = encode_keys(array, nan_position)[0]
+    choice = _choose(values, engine)
+    order = ARGSORT_ENGINES[choice["engine"]](values)
+    if explain:
+        return order, choice
+    return order
+
+
+def sort_by_key(keys, *payloads, engine=None, nan_position="last"):
+    """Sort keys and reorder every payload the same way; returns (keys, *payloads).
+
+    Equal keys keep their input order, so payload rows stay in sequence.
+    """
+    values, dtype = encode_keys(keys, nan_position)
+    payloads = [np.asarray(p) for p in payloads]
+    for p in payloads:
+        if len(p) != len(values):
+            raise ValueError(f"payload has {len(p)} rows but there are {len(values)} keys")
+
+    order = argsort(values, engine=engine)
+    return (decode_keys(values[order], dtype), *(p[order] for p in payloads))
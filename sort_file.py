@@ -0,0 +1,282 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import closing
+from queue import Full, Queue
+from threading import Event, Thread
+
+import numpy as np
+
+from external_sort import SORT_BYTES_PER_KEY, _chunks, _open_input, external_sort
+from result_writers import EXTENSIONS, WRITERS, memmap_output, write_result
+from run_length import RunLengthArray
+from sort_dispatch import sort
+from streaming_sort import StreamingCountingSort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Keys per chunk read from binary / .npy input
+READ_CHUNK = 1 << 20
+
+# Bytes per block read from text / CSV input
+TEXT_BLOCK = 8 * 1024**2
+
+# Chunks read ahead of the one being counted
+PREFETCH_DEPTH = 2
+
+# Seconds a blocked reader waits before checking whether the consumer is gone
+PREFETCH_POLL = 0.1
+
+SEPARATORS = (b",", b"\n", b"\r", b" ", b"\t")
+
+INPUT_FORMATS = ("binary", "npy", "csv", "text")
+
+
+# ---------------------------------------
+# READERS
+# ---------------------------------------
+def _read_binary(src, dtype):
+    # Raw binary and .npy alike are mapped one window at a time
+    keys = _open_input(src, dtype)
+    for start, stop in _chunks(len(keys), READ_CHUNK):
+        yield keys.read(start, stop)
+
+
+def _parse(data, dtype, src, offset):
+    # Commas become spaces and sep=" " matches any whitespace run, so one C
+    # call parses comma-separated rows and one-per-line files alike.
+    # np.fromstring reads a blank string as [0], hence the guard. offset is
+    # where data starts in src, for the error message.
+    text = data.replace(b",", b" ")
+    if not text.strip():
+        return np.zeros(0, dtype=dtype)
+    try:
+        return np.fromstring(text, dtype=dtype, sep=" ")
+    except ValueError as error:
+        raise ValueError(
+            f"{src}: cannot parse bytes {offset}-{offset + len(data)} as {np.dtype(dtype)} keys ({error})"
+        ) from error
+
+
+def _read_text(src, dtype):
+    # Blocks are cut after their last separator; the partial number left
+    # over is carried into the next block
+    rest = b""
+    offset = 0  # of rest in the file
+    with open(src, "rb") as f:
+        while True:
+            block = f.read(TEXT_BLOCK)
+            if not block:
+                break
+            data = rest + block
+            cut = max(data.rfind(sep) for sep in SEPARATORS)
+            if cut < 0:
+                rest = data
+                continue
+            rest = data[cut + 1:]
+            yield _parse(data[:cut], dtype, src, offset)
+            offset += cut + 1
+    if rest.strip():
+        yield _parse(rest, dtype, src, offset)
+
+
+READERS = {"binary": _read_binary, "npy": _read_binary, "csv": _read_text, "text": _read_text}
+
+
+def _prefetch(chunks, depth=PREFETCH_DEPTH):
+    # Read and parse the next chunks on a background thread while the caller
+    # counts the current one; file reads, memmap copies and parsing run in C.
+    # Closing the generator, or an error on either side, stops the reader and
+    # waits for it, so no thread is left blocked on a full queue.
+    queue = Queue(depth)
+    stop = Event()
+
+    def put(item):
+        # False once the consumer has stopped listening
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=PREFETCH_POLL)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    return
+            put((None, None))
+        except Exception as error:
+            put((None, error))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    thread = Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk, error = queue.get()
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+class _KeptKeys:
+    # Keys of a range too wide to count, waiting to be sorted: held in memory
+    # up to max_keys (None for no limit), then all appended to a raw spill
+    # file for external_sort
+    def __init__(self, dtype, max_keys, tmp_dir):
+        self.dtype = dtype
+        self.max_keys = max_keys
+        self.tmp_dir = tmp_dir
+        self.chunks = []
+        self.n = 0
+        self.tmp = self.file = self.path = None
+
+    def append(self, chunk):
+        self.n += len(chunk)
+        if self.file is None and (self.max_keys is None or self.n <= self.max_keys):
+            self.chunks.append(chunk)
+            return
+        if self.file is None:
+            self.tmp = tempfile.TemporaryDirectory(dir=self.tmp_dir)
+            self.path = os.path.join(self.tmp.name, "keys.bin")
+            self.file = open(self.path, "wb")
+            for kept in self.chunks:
+                kept.astype(self.dtype, copy=False).tofile(self.file)
+            self.chunks = []
+        chunk.astype(self.dtype, copy=False).tofile(self.file)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.tmp.cleanup()
+
+
+def _external(src, dst, fmt, dtype, memory_limit_bytes, tmp_dir):
+    # external_sort writes raw binary and .npy straight into dst; any other
+    # output is written from a sorted temporary .npy, a window at a time
+    npy_dst = str(dst).endswith(".npy")
+    if fmt == "memmap" or fmt == ("npy" if npy_dst else "binary"):
+        external_sort(src, dst, dtype, memory_limit_bytes, tmp_dir)
+        return dst
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        result = external_sort(src, os.path.join(tmp, "sorted.npy"), dtype, memory_limit_bytes, tmp_dir)
+        write_result(result, dst, fmt)
+        del result
+    return dst
+
+
+def _format_of(path, default=None):
+    fmt = EXTENSIONS.get(os.path.splitext(str(path))[1].lower(), default)
+    if fmt is None:
+        raise ValueError(f"cannot tell the format of {path!r}; pass it explicitly")
+    return fmt
+
+
+# ---------------------------------------
+# SORT FILE
+# ---------------------------------------
+def sort_file(src, dst, fmt=None, src_fmt=None, dtype=np.int64, memory_limit_bytes=None, tmp_dir=None):
+    """Sort the numbers in src into dst; returns dst.
+
+    src is raw binary of dtype or .npy (memory-mapped a window at a time) or
+    CSV / whitespace-separated text (parsed in blocks); src_fmt overrides
+    the extension. dst is written by result_writers in fmt, by default the
+    one its extension names, else src's.
+
+    Chunks are counted into a StreamingCountingSort while the next one is
+    read, so narrow key ranges never hold more than the counts. Once the
+    range outgrows a counting table the keys are kept and sorted by the
+    dispatcher instead. With memory_limit_bytes, keys that do not fit go
+    through external_sort: binary input straight from its file, text input
+    once the kept keys outgrow the budget, from a temporary binary file.
+    """
+    src_fmt = src_fmt or _format_of(src)
+    if src_fmt not in INPUT_FORMATS:
+        raise ValueError(f"unknown input format {src_fmt!r}; expected one of {INPUT_FORMATS}")
+    fmt = fmt or _format_of(dst, default=src_fmt)
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown output format {fmt!r}; expected one of {sorted(WRITERS)}")
+
+    if memory_limit_bytes is not None and src_fmt in ("binary", "npy"):
+        if len(_open_input(src, dtype)) * SORT_BYTES_PER_KEY > memory_limit_bytes:
+            return _external(src, dst, fmt, dtype, memory_limit_bytes, tmp_dir)
+
+    max_keys = None if memory_limit_bytes is None else memory_limit_bytes // SORT_BYTES_PER_KEY
+    sorter = StreamingCountingSort()
+    kept = None
+    try:
+        with closing(_prefetch(READERS[src_fmt](src, dtype))) as chunks:
+            for chunk in chunks:
+                if kept is not None:
+                    kept.append(chunk)
+                    continue
+                sorter.feed(chunk)
+                if sorter.sparse:
+                    kept = _KeptKeys(sorter.dtype, max_keys, tmp_dir)
+                    for counted in sorter.finish():
+                        kept.append(counted)
+
+        if kept is None:
+            values, counts = sorter._occupied()
+            write_result(RunLengthArray(values, counts, sorter.dtype or np.dtype(dtype)), dst, fmt)
+            return dst
+        if kept.file is not None:
+            kept.file.flush()
+            return _external(kept.path, dst, fmt, kept.dtype, memory_limit_bytes, tmp_dir)
+        keys = np.concatenate(kept.chunks)
+        kept.chunks = []
+    finally:
+        if kept is not None:
+            kept.close()
+
+    if fmt == "memmap":
+        out = memmap_output(dst, len(keys), keys.dtype)
+        sort(keys, out=out)
+        if isinstance(out, np.memmap):
+            out.flush()
+        del out
+    else:
+        write_result(sort(keys), dst, fmt)
+    return dst
+
+
+# ---------------------------------------
+# COMMAND LINE
+# ---------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sort the numbers of a file into another file.")
+    parser.add_argument("src", help="input: .npy, raw binary (.bin/.raw), .csv or .txt")
+    parser.add_argument("dst", help="output path")
+    parser.add_argument("--fmt", choices=sorted(WRITERS), help="output format (default: from dst's extension)")
+    parser.add_argument("--src-fmt", choices=INPUT_FORMATS, help="input format (default: from src's extension)")
+    parser.add_argument("--dtype", default="int64", help="key dtype of raw binary and text input (default: int64)")
+    parser.add_argument("--memory-limit-mb", type=float, help="sort out of core above this size")
+    parser.add_argument("--tmp-dir", help="directory for out-of-core spill files")
+    args = parser.parse_args(argv)
+
+    limit = None if args.memory_limit_mb is None else int(args.memory_limit_mb * 1024**2)
+    start = time.perf_counter()
+    try:
+        sort_file(args.src, args.dst, args.fmt, args.src_fmt, np.dtype(args.dtype), limit, args.tmp_dir)
+    except (OSError, ValueError, TypeError) as error:
+        print(f"sort_file: {error}", file=sys.stderr)
+        return 1
+    print(f"{args.src} -> {args.dst} in {time.perf_counter() - start:.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
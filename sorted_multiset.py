@@ -0,0 +1,281 @@
+import numpy as np
+
+from bucket_sort_numpy import INT64_MAX, INT64_MIN, MAX_COUNT_TABLE
+from key_transform import cast_keys, decode_keys, encode_keys
+from run_length import RunLengthArray
+from sparse_counting import _repeat
+from streaming_sort import _expand_windows, _merge_counts
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Table slots summed into one bucket total. rank() adds up whole buckets
+# from their prefix sums and at most one bucket's slots one by one.
+BUCKET_BITS = 11
+BUCKET_SLOTS = 1 << BUCKET_BITS
+
+ITER_CHUNK = 1 << 16
+
+
+# ---------------------------------------
+# SORTED MULTISET
+# ---------------------------------------
+class SortedMultiset:
+    """Multiset of keys kept in counting-sort form, updated batch by batch.
+
+    While the keys span at most MAX_COUNT_TABLE values they live in a dense
+    count table split into BUCKET_SLOTS-slot buckets with running totals:
+    add_batch / remove_batch cost O(batch), and rank() reads one prefix sum
+    over the bucket totals (rebuilt only after a change) plus part of one
+    bucket. Wider key sets switch to sorted (distinct key, count) runs; new
+    keys are then queued and merged in only when a query needs them.
+    """
+
+    def __init__(self, keys=None, dtype=None):
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.n = 0
+        self._lo = None
+        self._table = None  # dense: counts over [_lo, _lo + len(_table))
+        self._totals = None  # dense: count per bucket of _table
+        self._values = None  # sparse: sorted distinct keys ...
+        self._counts = None  # ... their counts
+        self._pending = []  # sparse: added keys not merged in yet
+        self._prefix = None  # cumulative counts, [0, ...], None when stale
+        if keys is not None:
+            self.add_batch(keys)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def sparse(self):
+        return self._values is not None
+
+    def _keys(self, array):
+        array = np.asarray(array)
+        if array.size == 0:
+            # np.asarray([]) is float64: only keys may fix the multiset's dtype
+            return np.zeros(0, dtype=np.int64)
+        if self.dtype is None:
+            self.dtype = array.dtype
+        else:
+            array = cast_keys(array, self.dtype)
+        return encode_keys(array)[0]
+
+    # ---------------------------------------
+    # UPDATES
+    # ---------------------------------------
+    def add_batch(self, keys):
+        """Add every key of the batch (repeats add several copies)."""
+        keys = self._keys(keys)
+        if len(keys) == 0:
+            return
+        self.n += len(keys)
+        self._prefix = None
+        if self.sparse:
+            self._pending.append(keys.copy())
+            return
+
+        lo = int(keys.min())
+        hi = int(keys.max())
+        if self._table is None or lo < self._lo or hi >= self._lo + len(self._table):
+            if not self._grow(lo, hi):
+                self._to_sparse()
+                self._pending.append(keys.copy())
+                return
+        offsets = keys - self._lo
+        np.add.at(self._table, offsets, 1)
+        np.add.at(self._totals, offsets >> BUCKET_BITS, 1)
+
+    def remove_batch(self, keys):
+        """Remove one copy per key of the batch; KeyError (and no change) if any is missing."""
+        keys = self._keys(keys)
+        if len(keys) == 0:
+            return
+        distinct, counts = np.unique(keys, return_counts=True)
+
+        held = np.zeros(len(distinct), dtype=np.int64)
+        if self.sparse:
+            self._merge_pending()
+            at = np.searchsorted(self._values, distinct)
+            found = at < len(self._values)
+            found[found] = self._values[at[found]] == distinct[found]
+            held[found] = self._counts[at[found]]
+        elif self._table is not None:
+            offsets = self._offsets(distinct)
+            inside = offsets < self._size()
+            held[inside] = self._table[offsets[inside]]
+
+        short = held < counts
+        if short.any():
+            missing = decode_keys(distinct[short], self.dtype)
+            raise KeyError(f"{short.sum()} keys are not in the multiset, e.g. {missing[0]}")
+
+        self.n -= len(keys)
+        self._prefix = None
+        if self.sparse:
+            self._counts[at] -= counts  # every key was found
+            keep = self._counts > 0
+            self._values, self._counts = self._values[keep], self._counts[keep]
+        else:
+            self._table[offsets] -= counts
+            np.subtract.at(self._totals, offsets >> BUCKET_BITS, counts)
+
+    def _offsets(self, keys):
+        # Slot of each key; keys outside the table map to len(table) or beyond
+        offsets = (keys - np.int64(self._lo)).view(np.uint64)
+        offsets = np.where(keys < self._lo, np.uint64(self._size()), offsets)
+        return np.minimum(offsets, np.uint64(self._size())).astype(np.int64)
+
+    def _size(self):
+        return 0 if self._table is None else len(self._table)
+
+    def _grow(self, lo, hi):
+        # Re-lay the dense table so it covers [lo, hi] as well; at least
+        # doubles it so a slowly widening key set is not copied every batch.
+        # False when the span would exceed MAX_COUNT_TABLE.
+        if self._table is not None:
+            lo = min(lo, self._lo)
+            hi = max(hi, self._lo + len(self._table) - 1)
+        needed = hi - lo + 1
+        if needed > MAX_COUNT_TABLE:
+            return False
+        size = min(MAX_COUNT_TABLE, max(needed, 2 * self._size()))
+        size = -(-size // BUCKET_SLOTS) * BUCKET_SLOTS
+        if self._table is not None and lo < self._lo:
+            lo = max(INT64_MIN, hi + 1 - size)  # widen downwards
+        size = min(size, INT64_MAX - lo + 1)
+
+        table = np.zeros(size, dtype=np.int64)
+        if self._table is not None:
+            start = self._lo - lo
+            table[start:start + len(self._table)] = self._table
+        self._table, self._lo = table, lo
+        padded = np.zeros(-(-size // BUCKET_SLOTS) * BUCKET_SLOTS, dtype=np.int64)
+        padded[:size] = table
+        self._totals = padded.reshape(-1, BUCKET_SLOTS).sum(axis=1)
+        return True
+
+    def _occupied(self):
+        if self.sparse:
+            self._merge_pending()
+            return self._values, self._counts
+        if self._table is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        occupied = np.flatnonzero(self._table)
+        return occupied + self._lo, self._table[occupied]
+
+    def _to_sparse(self):
+        self._values, self._counts = self._occupied()
+        self._table = self._totals = self._lo = None
+
+    def _merge_pending(self):
+        if self._pending:
+            more = np.unique(np.concatenate(self._pending), return_counts=True)
+            self._values, self._counts = _merge_counts(self._values, self._counts, *more)
+            self._pending = []
+
+    # ---------------------------------------
+    # QUERIES
+    # ---------------------------------------
+    def rank(self, x, side="left"):
+        """Position of x in the sorted keys, as np.searchsorted(sorted_keys, x, side).
+
+        "left" counts the keys below x, "right" the keys at or below it.
+        x may be a scalar or an array of queries, of any integer or float
+        dtype: queries are compared by value, so one outside the keys' dtype
+        or between two of its values still gets its count. As for
+        np.searchsorted, -0.0 and 0.0 are the same key here.
+        """
+        if side not in ("left", "right"):
+            raise ValueError(f"side must be 'left' or 'right', got {side!r}")
+        scalar = np.ndim(x) == 0
+        result = np.zeros(np.size(x), dtype=np.int64)
+        if self.n:
+            queries, right = self._queries(x, side)
+            for on, chosen in (("left", ~right), ("right", right)):
+                if chosen.any():
+                    result[chosen] = self._rank(queries[chosen], on)
+        return int(result[0]) if scalar else result.reshape(np.shape(x))
+
+    def count_less_than(self, x):
+        """Number of keys strictly below x (-0.0 is not below 0.0)."""
+        return self.rank(x, side="left")
+
+    def _queries(self, x, side):
+        # Queries as encoded keys of the multiset's dtype, and which to search
+        # on the right. A query the dtype cannot hold exactly (out of its
+        # range, a fraction against integer keys, a float64 between two
+        # float32 values) becomes the nearest key below or above it, searched
+        # on the side that counts the same keys. Zeros search as -0.0 on the
+        # left and 0.0 on the right, so both count as one key.
+        q = np.asarray(x).ravel()
+        if q.dtype.kind == "b":
+            q = q.astype(np.int64)
+        if self.dtype.kind == "f":
+            wide = q.astype(np.float64)
+            with np.errstate(over="ignore"):
+                keys = wide.astype(self.dtype)
+            lower, upper = keys < wide, keys > wide
+        else:
+            info = np.iinfo(self.dtype)
+            if q.dtype.kind == "f":
+                q = q.astype(np.float64)
+                top = float(info.max)
+                # info.max of a 64-bit dtype rounds up to 2**63 or 2**64
+                upper_end = q > top if int(top) == info.max else q >= top
+                below, above = q < float(info.min), upper_end | np.isnan(q)
+                whole = np.floor(np.where(below | above, 0, q))
+                keys = whole.astype(self.dtype)
+                lower = whole < q
+            else:
+                qinfo = np.iinfo(q.dtype)
+                lo = np.array(max(info.min, qinfo.min), dtype=q.dtype)
+                hi = np.array(min(info.max, qinfo.max), dtype=q.dtype)
+                below, above = q < lo, q > hi
+                keys = np.clip(q, lo, hi).astype(self.dtype)
+                lower = np.zeros(len(q), dtype=bool)
+            keys[below], keys[above] = info.min, info.max
+            lower = (lower & ~below) | above
+            upper = below
+        right = lower | ((side == "right") & ~upper)
+        if self.dtype.kind == "f":
+            zero = keys == 0
+            keys[zero] = np.where(right[zero], 0.0, -0.0)
+        return encode_keys(keys)[0], right
+
+    def _rank(self, queries, side):
+        if self.sparse:
+            self._merge_pending()
+            if self._prefix is None:
+                self._prefix = np.concatenate(([0], np.cumsum(self._counts)))
+            return self._prefix[np.searchsorted(self._values, queries, side=side)]
+
+        if self._prefix is None:
+            self._prefix = np.concatenate(([0], np.cumsum(self._totals)))
+        # Slots before the query position; "right" includes the query's own slot
+        below = np.minimum(self._offsets(queries) + (side == "right"), len(self._table))
+        below[queries < self._lo] = 0
+        bucket = below >> BUCKET_BITS
+        ranks = self._prefix[bucket]
+        for i in np.flatnonzero(below & (BUCKET_SLOTS - 1)):
+            start = bucket[i] << BUCKET_BITS
+            ranks[i] += self._table[start:below[i]].sum()
+        return ranks
+
+    def iter_sorted(self, chunk_size=ITER_CHUNK):
+        """Every key in ascending order, expanded chunk_size keys at a time."""
+        values, counts = self._occupied()
+        dtype = self.dtype if self.dtype is not None else np.int64
+        for block in _expand_windows(values, counts, chunk_size):
+            yield from decode_keys(block, dtype)
+
+    def to_numpy(self):
+        """Materialize the sorted keys as an ndarray."""
+        values, counts = self._occupied()
+        return decode_keys(_repeat(values, counts), self.dtype if self.dtype is not None else np.int64)
+
+    def to_run_length(self):
+        """The sorted keys as a RunLengthArray, without expanding them."""
+        values, counts = self._occupied()
+        return RunLengthArray(values.copy(), counts, self.dtype if self.dtype is not None else np.int64)
@@ -0,0 +1,68 @@
+import numpy as np
+
+from instrumentation import instrumented, phase
+from key_transform import check_out, decode_keys, encode_keys
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _sparse_counts(values):
+    # Coordinate compression: one count per distinct value, in order.
+    # np.unique beat a vectorized open-addressing hash table by 5-10x on
+    # 2M keys, and like the hash it never touches the empty part of the range.
+    return np.unique(values, return_counts=True)
+
+
+def _repeat(values, counts, out=None):
+    # np.repeat(values, counts) for counts > 0, optionally written into out
+    # with no temporary: out gets the first value and, where each later run
+    # starts, the step from the previous value; a running sum fills the rest.
+    # Steps wrap around like the int64 keys themselves, so any span is exact.
+    if out is None:
+        return np.repeat(values, counts)
+    if len(values):
+        out.fill(0)
+        out[0] = values[0]
+        out[np.cumsum(counts[:-1], dtype=np.int64)] = np.diff(values)
+        np.cumsum(out, out=out)
+    return out
+
+
+def _sparse_counting_sort(values, out=None):
+    with phase("count", elements=len(values)) as p:
+        distinct, counts = _sparse_counts(values)
+        p.record(distinct=len(distinct))
+    with phase("expand"):
+        return _repeat(distinct, counts, out)
+
+
+# ---------------------------------------
+# SPARSE COUNTING SORT
+# ---------------------------------------
+def sparse_counts(array):
+    """Sorted distinct values and how often each occurs.
+
+    Memory is proportional to n and the number of distinct values, not to max - min.
+    """
+    values, dtype = encode_keys(array)
+    distinct, counts = _sparse_counts(values)
+    return decode_keys(distinct, dtype), counts
+
+
+@instrumented("sparse")
+def sparse_counting_sort(array, out=None, workspace=None):
+    """Counting sort that only counts the values actually present.
+
+    out and workspace are as for counting_sort_numpy; the counts here are
+    np.unique's, so only out is used.
+    """
+    values, dtype = encode_keys(array)
+    if out is not None:
+        check_out(out, len(values), dtype)
+        if dtype == np.int64:
+            return _sparse_counting_sort(values, out)
+        return decode_keys(_sparse_counting_sort(values), dtype, out)
+    if len(values) <= 1:
+        return decode_keys(values.copy(), dtype)
+    return decode_keys(_sparse_counting_sort(values), dtype)
@@ -0,0 +1,148 @@
+import numpy as np
+
+from bucket_sort_numpy import MAX_COUNT_TABLE
+from key_transform import cast_keys, decode_keys, encode_keys
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+# ---------------------------------------
+# HELPERS
+# ---------------------------------------
+def _merge_counts(values, counts, more_values, more_counts):
+    # Union of two sorted (value, count) tables, adding counts of shared values
+    merged, inverse = np.unique(np.concatenate((values, more_values)), return_inverse=True)
+    weights = np.concatenate((counts, more_counts))
+    return merged, np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.int64)
+
+
+def _expand_windows(values, counts, chunk_size):
+    # Yield repeat(values, counts) in slices of at most chunk_size elements,
+    # expanding only the values that land in the current slice.
+    ends = np.cumsum(counts)
+    total = int(ends[-1]) if len(ends) else 0
+    for a in range(0, total, chunk_size):
+        b = min(total, a + chunk_size)
+        i = int(np.searchsorted(ends, a, side="right"))
+        j = int(np.searchsorted(ends, b - 1, side="right"))
+        reps = counts[i:j + 1].copy()
+        reps[0] = min(int(ends[i]), b) - a
+        if j > i:
+            reps[-1] = b - int(ends[j] - counts[j])
+        yield np.repeat(values[i:j + 1], reps)
+
+
+# ---------------------------------------
+# STREAMING COUNTING SORT
+# ---------------------------------------
+class StreamingCountingSort:
+    """Counting sort fed one chunk at a time.
+
+    feed() only updates counts, so memory stays at the counting table plus
+    one chunk. The table is dense over [min, max] while that range fits in
+    MAX_COUNT_TABLE slots and switches to (distinct value, count) pairs
+    beyond it. finish() yields the sorted keys in chunks of at most
+    chunk_size elements.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.dtype = None
+        self.n = 0
+        self.chunks = 0
+        self._lo = None
+        self._table = None  # dense counts over [_lo, _lo + len(_table))
+        self._values = None  # sparse mode: sorted distinct keys ...
+        self._counts = None  # ... and their counts
+
+    @property
+    def sparse(self):
+        return self._values is not None
+
+    def feed(self, chunk):
+        """Add a chunk of keys to the counts."""
+        chunk = np.asarray(chunk)
+        if chunk.size == 0:
+            # np.asarray([]) is float64: only keys may fix the stream's dtype
+            return
+        if self.dtype is None:
+            self.dtype = chunk.dtype
+        else:
+            chunk = cast_keys(chunk, self.dtype)
+
+        keys = encode_keys(chunk)[0]
+        self.n += len(keys)
+        self.chunks += 1
+
+        if self.sparse:
+            self._values, self._counts = _merge_counts(
+                self._values, self._counts, *np.unique(keys, return_counts=True)
+            )
+            return
+
+        lo = int(keys.min())
+        hi = int(keys.max())
+        if self._table is not None:
+            lo = min(lo, self._lo)
+            hi = max(hi, self._lo + len(self._table) - 1)
+
+        if hi - lo + 1 > MAX_COUNT_TABLE:
+            values, counts = self._occupied()
+            self._values, self._counts = _merge_counts(
+                values, counts, *np.unique(keys, return_counts=True)
+            )
+            self._table = self._lo = None
+            return
+
+        if self._table is None or lo < self._lo or hi >= self._lo + len(self._table):
+            table = np.zeros(hi - lo + 1, dtype=np.int64)
+            if self._table is not None:
+                start = self._lo - lo
+                table[start:start + len(self._table)] = self._table
+            self._table, self._lo = table, lo
+        np.add.at(self._table, keys - self._lo, 1)
+
+    def _occupied(self):
+        if self.sparse:
+            return self._values, self._counts
+        if self._table is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        occupied = np.flatnonzero(self._table)
+        return occupied + self._lo, self._table[occupied]
+
+    def stats(self):
+        """Running statistics: keys seen, chunks fed, min, max, distinct keys and table slots."""
+        values, _ = self._occupied()
+        dtype = self.dtype if self.dtype is not None else np.int64
+        bounds = decode_keys(values[[0, -1]], dtype) if len(values) else [None, None]
+        if self.sparse:
+            slots = len(self._counts)
+        else:
+            slots = 0 if self._table is None else len(self._table)
+        return {
+            "n": self.n,
+            "chunks": self.chunks,
+            "min": bounds[0],
+            "max": bounds[1],
+            "distinct": len(values),
+            "table_slots": slots,
+            "sparse": self.sparse,
+        }
+
+    def finish(self):
+        """Generator of sorted chunks of at most chunk_size keys."""
+        values, counts = self._occupied()
+        dtype = self.dtype if self.dtype is not None else np.int64
+        for block in _expand_windows(values, counts, self.chunk_size):
+            yield decode_keys(block, dtype)
+
+
+def streaming_sort(chunks, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Sort an iterable of key chunks; yields sorted chunks of at most chunk_size keys."""
+    sorter = StreamingCountingSort(chunk_size)
+    for chunk in chunks:
+        sorter.feed(chunk)
+    yield from sorter.finish()
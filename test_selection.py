@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from selection import median, percentiles, select, topk
+
+INT64_MIN, INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+UINT64_MAX = np.iinfo(np.uint64).max
+
+# Keys covering the whole 64-bit range with fewer than 4 of them: one
+# ~sqrt(n)-th of the span is wider than uint64 can hold
+FULL_SPAN = [
+    np.array([INT64_MIN, INT64_MAX], dtype=np.int64),
+    np.array([INT64_MAX, 0, INT64_MIN], dtype=np.int64),
+    np.array([UINT64_MAX, 0], dtype=np.uint64),
+    np.array([0, UINT64_MAX, 1], dtype=np.uint64),
+    np.array([np.inf, -np.inf], dtype=np.float64),
+]
+
+
+@pytest.mark.parametrize("keys", FULL_SPAN)
+def test_full_span_select_and_topk(keys):
+    expected = np.sort(keys)
+    assert [select(keys, k) for k in range(len(keys))] == expected.tolist()
+    assert topk(keys, 2).tolist() == expected[:2].tolist()
+    assert topk(keys, 2, largest=True).tolist() == expected[::-1][:2].tolist()
+
+
+@pytest.mark.parametrize("keys", FULL_SPAN)
+def test_full_span_percentiles_and_median(keys):
+    with np.errstate(invalid="ignore", over="ignore"):
+        np.testing.assert_array_equal(percentiles(keys, [0, 50, 100]), np.percentile(keys, [0, 50, 100]))
+        np.testing.assert_array_equal(median(keys), np.median(keys))
+
+
+@pytest.mark.parametrize("dtype", [np.int64, np.uint64, np.float32, np.float64])
+def test_percentiles_match_numpy(dtype):
+    keys = (np.random.default_rng(0).random(1001) * 1000).astype(dtype)
+    for q in (0, 12.5, 50, 99.9, 100, [1, 25, 75]):
+        expected, result = np.percentile(keys, q), percentiles(keys, q)
+        assert np.asarray(result).dtype == np.asarray(expected).dtype
+        np.testing.assert_array_equal(result, expected)
+    assert median(keys) == np.median(keys)
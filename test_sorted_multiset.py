@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from sorted_multiset import SortedMultiset
+
+
+def test_python_int_queries_on_unsigned_keys():
+    multiset = SortedMultiset(np.array([1, 2, 2], dtype=np.uint16))
+    assert multiset.rank(1) == 0
+    assert multiset.rank(2, side="right") == 3
+    assert multiset.rank(-1) == 0
+
+
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_out_of_range_queries_match_searchsorted(side):
+    keys = np.array([-5, 0, 7, 7], dtype=np.int8)
+    multiset = SortedMultiset(keys)
+    queries = [-1000, -128, 6.5, 7, 127, 1000, 1e300, -np.inf, np.nan]
+    expected = np.searchsorted(keys.astype(np.float64), queries, side=side)
+    assert multiset.rank(np.array(queries), side=side).tolist() == expected.tolist()
+
+
+def test_negative_zero_is_zero():
+    keys = np.array([-0.0, 0.0, 1.0])
+    multiset = SortedMultiset(keys)
+    assert multiset.count_less_than(0.0) == np.searchsorted(np.sort(keys), 0.0) == 0
+    assert multiset.rank(-0.0, side="right") == 2
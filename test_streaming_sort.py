@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from streaming_sort import StreamingCountingSort
+
+
+def _sorted(sorter):
+    return np.concatenate(list(sorter.finish()))
+
+
+def test_python_ints_join_an_unsigned_stream():
+    sorter = StreamingCountingSort()
+    sorter.feed(np.array([5, 1], dtype=np.uint32))
+    sorter.feed([3])
+    result = _sorted(sorter)
+    assert result.dtype == np.uint32
+    assert result.tolist() == [1, 3, 5]
+
+
+def test_out_of_range_keys_are_refused():
+    sorter = StreamingCountingSort()
+    sorter.feed(np.array([5, 1], dtype=np.uint32))
+    with pytest.raises(ValueError):
+        sorter.feed([-1])
+    with pytest.raises(ValueError):
+        sorter.feed([2**32])
+
+
+def test_empty_first_chunk_does_not_fix_the_dtype():
+    sorter = StreamingCountingSort()
+    sorter.feed([])
+    sorter.feed(np.array([2, 1], dtype=np.int16))
+    assert _sorted(sorter).dtype == np.int16
@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bucket_sort_numpy import _key_out, _sample_splitters
+from instrumentation import bucket_stats, instrumented, phase
+from key_transform import decode_keys, encode_keys
+from range_partition import (
+    PARTITIONS_PER_WORKER,
+    SAMPLE_SIZE,
+    _histogram_chunk,
+    _range_offsets,
+    _scatter_chunk,
+    _sort_range,
+)
+from sort_dispatch import sort
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Below this many keys handing work to threads costs more than it saves.
+# Lower than PARALLEL_THRESHOLD: threads need no spawn and no copy.
+THREADED_THRESHOLD = 250_000
+
+
+# ---------------------------------------
+# THREADED SORT
+# ---------------------------------------
+@instrumented("threaded")
+def threaded_sort(array, workers=None, executor=None, threshold=THREADED_THRESHOLD, out=None, workspace=None):
+    """Sort with a pool of threads writing into disjoint slices of one output.
+
+    Same three phases as parallel_sort (histogram, scatter, per-range sort)
+    but inside one process: nothing is pickled or copied into shared memory.
+    Inputs shorter than threshold, or a single worker, sort on the calling
+    thread. Pass an existing ThreadPoolExecutor, with its number of threads
+    as workers, to reuse its threads.
+
+    out and workspace are as for counting_sort_numpy: an int64 out is
+    scattered and sorted into directly, other dtypes go through the
+    workspace's key buffer. An out that overlaps the input (sorting in
+    place) is filled from scratch space once the threads are done.
+    """
+    values, dtype = encode_keys(array)
+    n = len(values)
+    if workers is None:
+        if executor is not None:
+            raise ValueError("pass workers= along with executor=, the number of threads in the executor")
+        workers = os.cpu_count()
+    keys = _key_out(out, n, dtype, workspace)
+    if n < threshold or workers < 2:
+        return decode_keys(sort(values, out=keys, workspace=workspace), dtype, out)
+
+    if keys is not None and np.may_share_memory(keys, values):
+        # The scatter reads the input while it writes the output
+        keys = workspace.keys(n) if workspace is not None else None
+    if keys is None:
+        keys = np.empty(n, dtype=np.int64)
+    with phase("sample_splitters"):
+        splitters = _sample_splitters(values, workers * PARTITIONS_PER_WORKER, SAMPLE_SIZE)
+    bounds = np.linspace(0, n, workers + 1).astype(np.int64)
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(workers)
+    try:
+        with phase("histogram", workers=workers) as p:
+            histograms = np.array(
+                list(executor.map(lambda c: _histogram_chunk(values, c[0], c[1], splitters), chunks))
+            )
+            sizes, starts, chunk_offsets = _range_offsets(histograms)
+            if p:
+                p.record(**bucket_stats(sizes))
+
+        with phase("scatter"):
+            list(executor.map(
+                lambda job: _scatter_chunk(values, keys, job[0][0], job[0][1], splitters, job[1]),
+                zip(chunks, chunk_offsets),
+            ))
+        ranges = [(s, s + c) for s, c in zip(starts, sizes) if c]
+        # Largest ranges first so the pool does not end waiting on one of them
+        ranges.sort(key=lambda r: r[0] - r[1])
+        with phase("sort_ranges", ranges=len(ranges)):
+            list(executor.map(lambda r: _sort_range(keys, r[0], r[1]), ranges))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return decode_keys(keys, dtype, out)
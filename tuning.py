@@ -0,0 +1,112 @@
+import json
+import os
+import platform
+import warnings
+
+# ---------------------------------------
+# CONFIG
+# ---------------------------------------
+# Where calibrate.py saves the host's thresholds and the sort modules read
+# them from; an empty SORT_TUNING_PROFILE turns tuning off (built-in defaults)
+PROFILE_ENV = "SORT_TUNING_PROFILE"
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "sort_tuning.json")
+
+PROFILE_VERSION = 1
+
+# The profile read at first use, keyed "module.CONSTANT"
+_thresholds = None
+
+
+# ---------------------------------------
+# HOST
+# ---------------------------------------
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _cache_bytes(name):
+    try:
+        return os.sysconf(name) or None
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def host_fingerprint():
+    """What the thresholds depend on: architecture, CPU model and cache sizes.
+
+    A profile is only applied on a host with the same fingerprint, so one
+    shared home directory cannot carry thresholds across CPU generations.
+    """
+    return {
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+        "l2_bytes": _cache_bytes("SC_LEVEL2_CACHE_SIZE"),
+        "l3_bytes": _cache_bytes("SC_LEVEL3_CACHE_SIZE"),
+    }
+
+
+# ---------------------------------------
+# PROFILE
+# ---------------------------------------
+def profile_path():
+    """The profile file in use, or None when tuning is turned off."""
+    path = os.environ.get(PROFILE_ENV, DEFAULT_PROFILE_PATH)
+    return path or None
+
+
+def save_profile(thresholds, measurements=None, path=None):
+    """Write thresholds ({"module.CONSTANT": value}) for this host; returns the path."""
+    path = path or profile_path() or DEFAULT_PROFILE_PATH
+    profile = {
+        "version": PROFILE_VERSION,
+        "host": host_fingerprint(),
+        "thresholds": thresholds,
+        "measurements": measurements or {},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def load_profile(path=None):
+    """The thresholds saved for this host, {} when there are none that apply.
+
+    A missing file means "not calibrated"; an unreadable one, or one written
+    on another host, is ignored with a warning.
+    """
+    path = path or profile_path()
+    if path is None or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("version") != PROFILE_VERSION:
+            raise ValueError(f"profile version {profile.get('version')!r}, expected {PROFILE_VERSION}")
+        thresholds = dict(profile["thresholds"])
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        warnings.warn(f"ignoring sort tuning profile {path}: {error}")
+        return {}
+    if profile.get("host") != host_fingerprint():
+        warnings.warn(f"ignoring sort tuning profile {path}: it was calibrated on another host")
+        return {}
+    return thresholds
+
+
+def thresholds_for(module):
+    """Calibrated constants of one module as {CONSTANT: value}; reads the profile once."""
+    global _thresholds
+    if _thresholds is None:
+        _thresholds = load_profile()
+    prefix = module + "."
+    return {key[len(prefix):]: value for key, value in _thresholds.items() if key.startswith(prefix)}
+